@@ -0,0 +1,29 @@
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+from backend.ports.metrics_exporter import MetricsExporter
+
+
+class JsonFileExporter(MetricsExporter):
+    """Class for writing instrumentation metrics to a JSON file."""
+
+    def __init__(self, path: Path) -> None:
+        """
+
+        Args:
+            path:
+                File to (over)write. May contain "{pid}", so that every worker
+                process writes its own file. It is filled in on every export, as
+                worker processes forked after construction have another pid.
+
+        """
+        self.path = Path(path)
+
+    def export(self, snapshot: dict[str, Any]) -> None:
+        # write to a temporary file first, so readers never see a half written file
+        path = Path(str(self.path).format(pid=os.getpid()))
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps(snapshot, indent=2))
+        tmp_path.replace(path)
@@ -0,0 +1,39 @@
+import logging
+from typing import Any
+
+from backend.ports.metrics_exporter import MetricsExporter
+
+logger = logging.getLogger("backend.instrumentation")
+
+
+class LogExporter(MetricsExporter):
+    """Class for writing instrumentation metrics to the log, one line per stage."""
+
+    def __init__(self, level: int = logging.INFO) -> None:
+        self.level = level
+
+    def export(self, snapshot: dict[str, Any]) -> None:
+        for name, stage in snapshot["stages"].items():
+            logger.log(
+                self.level,
+                "stage=%s calls=%d total=%.3fs max=%.3fs rows=%d bytes_read=%d "
+                "peak_memory=%d",
+                name,
+                stage["calls"],
+                stage["total_seconds"],
+                stage["max_seconds"],
+                stage["rows"],
+                stage["bytes_read"],
+                stage["peak_memory_bytes"],
+            )
+        for name, cache in snapshot["caches"].items():
+            logger.log(
+                self.level,
+                "cache=%s hits=%d misses=%d hit_ratio=%.2f",
+                name,
+                cache["hits"],
+                cache["misses"],
+                cache["hit_ratio"],
+            )
+        for name, values in snapshot["sources"].items():
+            logger.log(self.level, "source=%s %s", name, values)
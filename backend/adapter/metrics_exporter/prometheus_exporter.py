@@ -0,0 +1,72 @@
+import os
+from pathlib import Path
+from typing import Any
+
+from backend.ports.metrics_exporter import MetricsExporter
+
+PREFIX = "gnisten"
+
+STAGE_METRICS = [
+    # (key in snapshot, metric name, type, help)
+    ("calls", "stage_calls_total", "counter", "Number of times the stage ran"),
+    ("total_seconds", "stage_seconds_total", "counter", "Time spent in the stage"),
+    ("max_seconds", "stage_max_seconds", "gauge", "Slowest run of the stage"),
+    ("rows", "stage_rows_total", "counter", "Rows processed by the stage"),
+    ("bytes_read", "stage_read_bytes_total", "counter", "Bytes read by the stage"),
+    (
+        "peak_memory_bytes",
+        "stage_peak_memory_bytes",
+        "gauge",
+        "Highest traced memory allocated during the stage",
+    ),
+]
+
+CACHE_METRICS = [
+    ("hits", "cache_hits_total", "counter", "Cache lookups which were hits"),
+    ("misses", "cache_misses_total", "counter", "Cache lookups which were misses"),
+]
+
+
+def format_prometheus(snapshot: dict[str, Any]) -> str:
+    """Format a snapshot in the Prometheus text exposition format."""
+    lines = []
+    for group, label, metrics in [
+        ("stages", "stage", STAGE_METRICS),
+        ("caches", "cache", CACHE_METRICS),
+    ]:
+        for key, name, metric_type, description in metrics:
+            lines.append(f"# HELP {PREFIX}_{name} {description}")
+            lines.append(f"# TYPE {PREFIX}_{name} {metric_type}")
+            for entry, values in snapshot[group].items():
+                lines.append(f'{PREFIX}_{name}{{{label}="{entry}"}} {values[key]}')
+
+    for source, values in snapshot["sources"].items():
+        for key, value in values.items():
+            lines.append(f"{PREFIX}_{source}_{key} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusExporter(MetricsExporter):
+    """
+    Class for writing instrumentation metrics as a Prometheus text file, e.g. to be
+    picked up by the node exporter textfile collector.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """
+
+        Args:
+            path:
+                File to (over)write. May contain "{pid}", so that every worker
+                process writes its own file. It is filled in on every export, as
+                worker processes forked after construction have another pid.
+
+        """
+        self.path = Path(path)
+
+    def export(self, snapshot: dict[str, Any]) -> None:
+        path = Path(str(self.path).format(pid=os.getpid()))
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(format_prometheus(snapshot))
+        tmp_path.replace(path)
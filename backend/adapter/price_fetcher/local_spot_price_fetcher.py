@@ -1,11 +1,14 @@
 from datetime import datetime
 from pathlib import Path
-from zoneinfo import ZoneInfo
 
+import numpy as np
 import pandas as pd
 
+from backend.instrumentation import instrumentation
 from backend.ports.price_fetcher import PriceFetcher
 
+PRICE_COLUMNS = ["timestamp", "ingestion_time", "value"]
+
 
 class LocalSpotPriceFetcher(PriceFetcher):
     """Class for providing spot prices for Norway from local file."""
@@ -28,38 +31,82 @@ class LocalSpotPriceFetcher(PriceFetcher):
         if not self.path_to_norway_data.exists():
             raise ValueError(f"{path_to_norway_data=} does not exist")
         self.files = list(self.path_to_norway_data.iterdir())
+        self._parsed: dict[Path, tuple[tuple[int, int], pd.Series]] = {}
         if any("PriceDayAheadNO" not in str(file) for file in self.files):
             msg = f"Unexpected content in folder: {self.files}"
             raise ValueError(msg)
 
+    @instrumentation.instrumented("get_price")
     def get_price(
         self,
         price_area: str,
         start: datetime,
         end: datetime,
     ) -> list[tuple[datetime, float]]:
+        prices = self.get_price_series(price_area=price_area, start=start, end=end)
+        instrumentation.add_rows(len(prices))
+        return list(zip(prices.index.to_pydatetime(), prices.tolist()))
+
+    def get_price_series(
+        self,
+        price_area: str,
+        start: datetime,
+        end: datetime,
+    ) -> pd.Series:
+        """
+        The price file of an area is parsed once, and kept in memory until it is
+        changed on disk.
+        """
         if price_area not in ["NO1", "NO2", "NO3", "NO4", "NO5"]:
             raise ValueError
-        file = next(
-            iter(
-                file for file in self.files if f"PriceDayAhead{price_area}" in str(file)
-            )
+        # looked up on every call, the file may have been replaced by a newer one,
+        # e.g. PriceDayAheadNO1_2022_2025.csv by PriceDayAheadNO1_2022_2026.csv
+        self.files = list(self.path_to_norway_data.iterdir())
+        file = max(
+            file for file in self.files if f"PriceDayAhead{price_area}" in str(file)
         )
-        content = pd.read_csv(file)
-
-        time_price_pairs: list[tuple[datetime, float]] = [
-            (time, float(value.replace(",", ".")))
-            for timestamp, value in zip(
-                content["timestamp"], content["value"], strict=True
-            )
-            if (
-                time := datetime.fromisoformat(timestamp).replace(
-                    tzinfo=ZoneInfo("UTC")
-                )
-                # TODO check API docs (???) if the times in the csv files are actually UTC
-            )
-            >= start
-            and time <= end
-        ]
-
-        return sorted(time_price_pairs, key=lambda pair: pair[0])
+        stat = file.stat()
+        version = (stat.st_mtime_ns, stat.st_size)
+        cached = self._parsed.get(file)
+        if cached is None or cached[0] != version:
+            cached = (version, read_price_series(file))
+            self._parsed[file] = cached
+        return cached[1].loc[start:end]
+
+
+def read_price_series(file: Path) -> pd.Series:
+    """
+    Prices in EUR/MWh in a file structured like PriceDayAheadNO1_2022_2025.csv,
+    which can also be a file with only the newest day(s), indexed by time in UTC.
+
+    Only the timestamp, value and ingestion_time columns are parsed, and the decimal
+    commas are converted by the parser. If a price has been revised, i.e. there are
+    several rows with the same timestamp, the one ingested last is used.
+    """
+    instrumentation.add_bytes(file.stat().st_size)
+    content = pd.read_csv(
+        file,
+        usecols=PRICE_COLUMNS,
+        decimal=",",
+        dtype={"timestamp": str, "ingestion_time": str, "value": float},
+    )
+
+    # TODO check API docs (???) if the times in the csv files are actually UTC
+    times = pd.to_datetime(content["timestamp"], format="ISO8601").to_numpy()
+    ingested = pd.to_datetime(
+        content["ingestion_time"], format="ISO8601", errors="coerce"
+    ).to_numpy()
+    # by time and then by ingestion, the last row of every time is the latest
+    order = np.lexsort((ingested, times))
+    times = times[order]
+    is_latest = np.r_[times[1:] != times[:-1], True]
+    return pd.Series(
+        content["value"].to_numpy()[order][is_latest],
+        index=pd.DatetimeIndex(times[is_latest]).tz_localize("UTC").as_unit("us"),
+    )
+
+
+def read_price_file(file: Path) -> list[tuple[datetime, float]]:
+    """Prices in a price file as (time in UTC, EUR/MWh) pairs, see read_price_series."""
+    prices = read_price_series(file)
+    return list(zip(prices.index.to_pydatetime(), prices.tolist()))
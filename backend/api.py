@@ -0,0 +1,209 @@
+"""
+Headless HTTP/JSON API around the Backend.
+
+Run locally with
+
+    uvicorn backend.api:app --port 8000
+
+The cost computation is CPU-bound, so it runs in a process pool where every worker
+holds its own Backend. Identical concurrent queries are coalesced into a single
+computation (see backend.single_flight), and results can be returned as JSON or as
+an Arrow IPC stream.
+"""
+
+import asyncio
+import multiprocessing.util
+import os
+from collections.abc import AsyncIterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import Any, Literal
+
+import pandas as pd
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse
+
+from backend.adapter.metrics_exporter.prometheus_exporter import format_prometheus
+from backend.app import Backend
+from backend.export import frame_to_arrow
+from backend.instrumentation import instrumentation
+from backend.price_matrix import PRICE_AREAS
+from backend.single_flight import AsyncSingleFlight
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+
+_worker_backend: Backend | None = None
+
+
+def _init_worker() -> None:
+    """Create one Backend per worker, so the price files are only located once."""
+    global _worker_backend
+    _worker_backend = Backend()
+    # workers leave through os._exit, so atexit does not export their last metrics
+    multiprocessing.util.Finalize(None, instrumentation.flush, exitpriority=10)
+
+
+def _compute_cost_comparison(
+    meter_name: str, fastpris_in_NOK: float, price_area: str
+) -> dict[str, pd.DataFrame]:
+    """Runs in a worker process, must therefore be a picklable module function."""
+    if _worker_backend is None:
+        _init_worker()
+    if not hasattr(_worker_backend, "fetcher"):
+        raise RuntimeError("Environment variable PATH_TO_NORWAY_PRICES not set")
+    return _worker_backend.get_cost_comparison(
+        fastpris_in_NOK=fastpris_in_NOK,
+        meter_name=meter_name,
+        price_area=price_area,
+    )
+
+
+def available_meters() -> list[str]:
+    return sorted(
+        d for d in os.listdir(DATA_PATH) if os.path.isdir(os.path.join(DATA_PATH, d))
+    )
+
+
+def _frame_response(data: pd.DataFrame, response_format: str) -> Response:
+    if response_format == "arrow":
+        return Response(content=frame_to_arrow(data), media_type=ARROW_MEDIA_TYPE)
+    return Response(
+        content=data.rename_axis("time").to_json(orient="split", date_format="iso"),
+        media_type="application/json",
+    )
+
+
+def create_app(
+    executor: Executor | None = None, max_workers: int | None = None
+) -> FastAPI:
+    """
+    Args:
+        executor:
+            Executor running the cost computations. If not given, a process pool
+            with max_workers processes is created and shut down with the app.
+        max_workers:
+            Number of worker processes, defaults to the number of CPUs.
+    """
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        if executor is not None:
+            app.state.executor = executor
+            yield
+            return
+        app.state.executor = ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_init_worker
+        )
+        try:
+            yield
+        finally:
+            app.state.executor.shutdown(cancel_futures=True)
+
+    app = FastAPI(title="Norgespriskalkulator", lifespan=lifespan)
+    app.state.single_flight = AsyncSingleFlight()
+    instrumentation.register_source(
+        "api_single_flight", app.state.single_flight.stats.as_dict
+    )
+
+    async def cost_comparison(
+        meter: str, fastpris: float, price_area: str
+    ) -> dict[str, pd.DataFrame]:
+        if price_area not in PRICE_AREAS:
+            raise HTTPException(status_code=422, detail=f"Unknown {price_area=}")
+        if meter not in available_meters():
+            raise HTTPException(status_code=404, detail=f"Unknown {meter=}")
+
+        async def compute() -> dict[str, pd.DataFrame]:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                app.state.executor,
+                _compute_cost_comparison,
+                meter,
+                fastpris,
+                price_area,
+            )
+
+        return await app.state.single_flight.do((meter, fastpris, price_area), compute)
+
+    def select_window(
+        data: pd.DataFrame, start: date | None, end: date | None
+    ) -> pd.DataFrame:
+        """The rows from the start of the start day until the end of the end day."""
+        data = data.loc[pd.Timestamp(start) if start else None :]
+        if end:
+            data = data[data.index < pd.Timestamp(end) + pd.Timedelta(days=1)]
+        return data
+
+    @app.get("/health")
+    async def health() -> dict[str, str]:
+        return {"status": "ok"}
+
+    @app.get("/stats")
+    async def stats() -> dict[str, float]:
+        """How many requests were served by joining an identical running request."""
+        return app.state.single_flight.stats.as_dict()
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics() -> str:
+        """
+        Metrics of the API process in Prometheus text format. The workers export
+        their own metrics, see backend.instrumentation.
+        """
+        return format_prometheus(instrumentation.snapshot())
+
+    @app.get("/meters")
+    async def meters() -> list[str]:
+        return available_meters()
+
+    @app.get("/comparison")
+    async def comparison(
+        meter: str,
+        price_area: str,
+        fastpris: float = Query(0.4, description="Norgespris in NOK/kWh"),
+        start: date | None = None,
+        end: date | None = None,
+        format: Literal["json", "arrow"] = "json",
+    ) -> Response:
+        """Hourly cost with spot price and with Norgespris."""
+        data = await cost_comparison(meter, fastpris, price_area)
+        return _frame_response(select_window(data["original"], start, end), format)
+
+    @app.get("/aggregates/{level}")
+    async def aggregates(
+        level: Literal["hour", "day", "month", "year"],
+        meter: str,
+        price_area: str,
+        fastpris: float = Query(0.4, description="Norgespris in NOK/kWh"),
+        start: date | None = None,
+        end: date | None = None,
+        format: Literal["json", "arrow"] = "json",
+    ) -> Response:
+        """Cost with spot price and with Norgespris summed per hour/day/month/year."""
+        data = await cost_comparison(meter, fastpris, price_area)
+        return _frame_response(select_window(data[level], start, end), format)
+
+    @app.get("/totals")
+    async def totals(
+        meter: str,
+        price_area: str,
+        fastpris: float = Query(0.4, description="Norgespris in NOK/kWh"),
+        start: date | None = None,
+        end: date | None = None,
+    ) -> dict[str, Any]:
+        """Total cost within the window, and which of the prices is cheapest."""
+        data = await cost_comparison(meter, fastpris, price_area)
+        total = select_window(data["original"], start, end).sum()
+        return {
+            "Spotpris": float(total["Spotpris"]),
+            "Norgespris": float(total["Norgespris"]),
+            "cheapest": (
+                "Norgespris" if total["Norgespris"] < total["Spotpris"] else "Spotpris"
+            ),
+        }
+
+    return app
+
+
+app = create_app()
@@ -1,15 +1,59 @@
+import logging
 import os
+import threading
+import time
 import warnings
-from datetime import datetime, timedelta
+from collections.abc import Callable, Hashable, Sequence
+from datetime import datetime
 from pathlib import Path
 from zoneinfo import ZoneInfo
 
+import numpy as np
 import pandas as pd
 
 from backend.adapter.price_fetcher.local_spot_price_fetcher import LocalSpotPriceFetcher
-from utils.ReadElhubExport import read_elhub_data
+from backend.break_even import BreakEvenResult, solve_break_even
+from backend.cache import MemoryBoundedCache
+from backend.consumption_store import ConsumptionStore
+from backend.cost_comparison import CostComparison
+from backend.grid_tariff import GridTariffResult, calculate_grid_tariff, load_tariff
+from backend.instrumentation import instrumentation
+from backend.load_shifting import LoadShiftingResult, simulate_load_shifting
+from backend.price_matrix import PRICE_AREAS, PriceMatrixStore
+from backend.similarity import FEATURES, LoadShapeIndex, load_shape_features
+from backend.single_flight import SingleFlight
+from backend.timeseries import (
+    consumption_array,
+    consumption_matrix,
+    hourly_axis,
+    to_day_matrix,
+)
+from utils.ReadElhubExport import read_elhub_file
+
+logger = logging.getLogger(__name__)
 
 STROEMSTOETTE_THRESHOLD = 0.75  # NOK/kWh
+NOK_PER_EUR = 11
+
+# Period for which both meter readings and spot prices are available
+HISTORY_START = datetime(2022, 6, 1, hour=0, tzinfo=ZoneInfo("UTC"))
+HISTORY_END = datetime(2025, 3, 1, hour=23, tzinfo=ZoneInfo("UTC"))
+
+COST_COLUMNS = ["Spotpris", "Norgespris"]
+
+# Memory budgets of the meter data and of the cost comparisons kept by a Backend
+CONSUMPTION_CACHE_MAX_BYTES = 256 * 2**20
+COST_COMPARISON_CACHE_MAX_BYTES = 256 * 2**20
+
+# How often a Backend looks for new price files and Elhub exports, see refresh
+REFRESH_INTERVAL_SECONDS = 60
+
+# Shared by all Backend instances in the process, so that concurrent sessions asking
+# for the same comparison only compute it once
+cost_comparison_flight = SingleFlight()
+instrumentation.register_source(
+    "cost_comparison_flight", cost_comparison_flight.stats.as_dict
+)
 
 
 def calculate_stroemstoette(price_in_NOK_per_kWh: float) -> float:
@@ -23,16 +67,44 @@ def calculate_stroemstoette(price_in_NOK_per_kWh: float) -> float:
     return price_in_NOK_per_kWh
 
 
+def calculate_stroemstoette_array(prices_in_NOK_per_kWh: np.ndarray) -> np.ndarray:
+    """Vectorized calculate_stroemstoette, NaN stays NaN."""
+    return np.where(
+        prices_in_NOK_per_kWh > STROEMSTOETTE_THRESHOLD,
+        STROEMSTOETTE_THRESHOLD
+        + (prices_in_NOK_per_kWh - STROEMSTOETTE_THRESHOLD) * 0.1,
+        prices_in_NOK_per_kWh,
+    )
+
+
 class Backend:
-    def __init__(self) -> None:
-        try:
-            path = os.environ["PATH_TO_NORWAY_PRICES"]
-        except KeyError:
-            msg = "Environment variable PATH_TO_NORWAY_PRICES not set, skipping test"
-            warnings.warn(msg)
-            return
+    def __init__(self, path_to_norway_data: Path | None = None) -> None:
+        self.consumption_store = ConsumptionStore(max_bytes=CONSUMPTION_CACHE_MAX_BYTES)
+        self.cost_comparisons: MemoryBoundedCache[CostComparison] = MemoryBoundedCache(
+            "cost_comparison",
+            max_bytes=COST_COMPARISON_CACHE_MAX_BYTES,
+            sizeof=lambda comparison: comparison.nbytes,
+        )
+        self.load_shape_index: LoadShapeIndex | None = None
+        # bumped by every append, a comparison computed from older data is not cached
+        self._generation = 0
+        self._generation_lock = threading.Lock()
+        self.refresh_interval = REFRESH_INTERVAL_SECONDS
+        self._last_refresh = time.monotonic()
+        self._refresh_lock = threading.Lock()
+
+        if path_to_norway_data is None:
+            try:
+                path_to_norway_data = Path(os.environ["PATH_TO_NORWAY_PRICES"])
+            except KeyError:
+                msg = (
+                    "Environment variable PATH_TO_NORWAY_PRICES not set, skipping test"
+                )
+                warnings.warn(msg)
+                return
 
-        self.fetcher = LocalSpotPriceFetcher(path_to_norway_data=Path(path))
+        self.fetcher = LocalSpotPriceFetcher(path_to_norway_data=path_to_norway_data)
+        self.price_matrix = PriceMatrixStore(self.fetcher)
 
     def get_spotpris_cost_per_hour(
         self,
@@ -41,24 +113,20 @@ class Backend:
         meter_name: str = "Trydal_1",
         price_area: str = "NO1",
     ) -> pd.Series:
-        prices_in_eur = self.fetcher.get_price(
-            price_area=price_area, start=start, end=end
+        prices_in_eur = self.price_matrix.get(start, end, [price_area]).pairs(
+            price_area
         )
 
         # fra Eur/MWh til NOK/kWh
         prices = [
-            (date, calculate_stroemstoette(price * 11 / 1e3))
+            (date, calculate_stroemstoette(price * NOK_PER_EUR / 1e3))
             for (date, price) in prices_in_eur
         ]
 
-        all_data = read_elhub_data(meter_dirs=[meter_name])
-
-        sample_consumption_data = all_data[meter_name]
+        consumption = self.consumption_store.get(meter_name).series(start, end)
 
         # Calculate cost using the spot price
-        return self._calculate_consumption_cost_per_hour(
-            sample_consumption_data, prices, start=start, end=end
-        )
+        return self._calculate_consumption_cost_per_hour(consumption, prices)
 
     def get_fastpris_cost_per_hour(
         self,
@@ -67,71 +135,421 @@ class Backend:
         fastpris_in_NOK: float,
         meter_name: str = "Trydal_1",
     ) -> pd.Series:
-        prices = []
+        # the cost with a fixed price is the consumption scaled by the price
+        consumption = self.consumption_store.get(meter_name).series(start, end)
+        return consumption * fastpris_in_NOK
 
-        time = start
-        while time <= end:
-            prices.append((time, fastpris_in_NOK))
-            time += timedelta(hours=1)
+    @instrumentation.instrumented("break_even")
+    def get_break_even_prices(
+        self,
+        meter_names: list[str] | None = None,
+        price_area: str = "NO1",
+        start: datetime = HISTORY_START,
+        end: datetime = HISTORY_END,
+        window: str = "month",
+    ) -> BreakEvenResult:
+        """
+        Norgespris at which the cost is the same as with spot price and strømstøtte,
+        for every meter (all meters if meter_names is None) and window ("day",
+        "month", "year" or "all"), see backend.break_even.
+        """
+        meter_data = {
+            meter_name: self.consumption_store.get(meter_name).hourly
+            for meter_name in meter_names or self.consumption_store.meter_names()
+        }
+        axis = hourly_axis(start, end)
+        return solve_break_even(
+            meter_names=list(meter_data),
+            consumption=consumption_matrix(meter_data, axis),
+            spot_price=self._spot_price_array(axis, [price_area])[:, 0],
+            axis=axis,
+            window=window,
+        )
 
-        all_data = read_elhub_data(meter_dirs=[meter_name])
+    @instrumentation.instrumented("price_area_comparison")
+    def compare_price_areas(
+        self,
+        meter_name: str = "Trydal_1",
+        start: datetime = HISTORY_START,
+        end: datetime = HISTORY_END,
+    ) -> pd.DataFrame:
+        """
+        Cost of the meter with spot price and strømstøtte in every price area.
 
-        sample_consumption_data = all_data[meter_name]
+        Returns:
+        --------
+        DataFrame indexed by price area with the cost ("Spotpris"), the consumption
+        in hours with price ("Forbruk") and the break-even Norgespris ("Break-even").
+        """
+        axis = hourly_axis(start, end)
+        consumption = consumption_array(
+            self.consumption_store.get(meter_name).hourly, axis
+        )
+        spot_price = self._spot_price_array(axis, PRICE_AREAS)
 
-        # Calculate cost using the spot price
-        return self._calculate_consumption_cost_per_hour(
-            sample_consumption_data, prices, start=start, end=end
+        has_value = ~np.isnan(spot_price) & ~np.isnan(consumption)[:, None]
+        billed = np.where(has_value, consumption[:, None], 0.0)
+        spot_cost = (billed * np.where(has_value, spot_price, 0.0)).sum(axis=0)
+        total_consumption = billed.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            break_even = spot_cost / np.where(
+                total_consumption > 0, total_consumption, np.nan
+            )
+        return pd.DataFrame(
+            {
+                "Spotpris": spot_cost,
+                "Forbruk": total_consumption,
+                "Break-even": break_even,
+            },
+            index=pd.Index(PRICE_AREAS, name="price_area"),
+        )
+
+    @instrumentation.instrumented("load_shape_index")
+    def build_load_shape_index(
+        self,
+        meter_names: list[str] | None = None,
+        start: datetime = HISTORY_START,
+        end: datetime = HISTORY_END,
+        n_lists: int = 0,
+        batch_size: int = 256,
+    ) -> LoadShapeIndex:
+        """
+        Index of the load shapes of the meters (all meters if meter_names is None),
+        see backend.similarity. The meters are read batch_size at a time, so that
+        only the consumption of one batch is in memory as a (meters x hours) array.
+        """
+        meter_names = meter_names or self.consumption_store.meter_names()
+        axis = hourly_axis(start, end)
+        features = [
+            load_shape_features(
+                consumption_matrix(
+                    {
+                        name: self.consumption_store.get(name).hourly
+                        for name in meter_names[first : first + batch_size]
+                    },
+                    axis,
+                ),
+                axis,
+            )
+            for first in range(0, len(meter_names), batch_size)
+        ]
+        instrumentation.add_rows(len(meter_names))
+        return LoadShapeIndex.build(
+            meter_names,
+            np.vstack(features) if features else np.empty((0, FEATURES)),
+            n_lists=n_lists,
+        )
+
+    def similar_meters(self, meter_name: str, k: int = 5) -> list[tuple[str, float]]:
+        """
+        The k meters with the most similar load shape, with their distance (0 is
+        identical), from an index of all meters which is built on first use.
+        """
+        if self.load_shape_index is None:
+            self.load_shape_index = self.build_load_shape_index()
+        return self.load_shape_index.similar(meter_name, k)
+
+    @instrumentation.instrumented("grid_tariff")
+    def get_grid_tariff(
+        self,
+        tariff_name: str = "example",
+        meter_names: list[str] | None = None,
+        start: datetime = HISTORY_START,
+        end: datetime = HISTORY_END,
+    ) -> GridTariffResult:
+        """
+        Grid tariff (nettleie) per month for every meter (all meters if meter_names
+        is None), with the tariff table tariff_name from backend/tariffs, see
+        backend.grid_tariff.
+        """
+        meter_names = meter_names or self.consumption_store.meter_names()
+        axis = hourly_axis(start, end)
+        consumption = consumption_matrix(
+            {name: self.consumption_store.get(name).hourly for name in meter_names},
+            axis,
+        )
+        return calculate_grid_tariff(
+            meter_names=meter_names,
+            consumption=consumption,
+            axis=axis,
+            tariff=load_tariff(tariff_name),
+        )
+
+    @instrumentation.instrumented("load_shifting")
+    def simulate_load_shifting(
+        self,
+        shares: Sequence[float],
+        meter_names: list[str] | None = None,
+        price_area: str = "NO1",
+        start: datetime = HISTORY_START,
+        end: datetime = HISTORY_END,
+        max_kwh_per_hour: float = np.inf,
+        allowed_hours: Sequence[int] = range(24),
+        batch_size: int = 32,
+    ) -> LoadShiftingResult:
+        """
+        Spot cost if the given shares of the daily consumption were moved to the
+        cheapest hours of each day, for every meter (all meters if meter_names is
+        None), see backend.load_shifting. The meters are simulated batch_size at a
+        time, as the simulation holds (shares x meters x days x 24) arrays.
+        """
+        meter_names = meter_names or self.consumption_store.meter_names()
+        axis = hourly_axis(start, end)
+        spot_price, _ = to_day_matrix(
+            self._spot_price_array(axis, [price_area])[:, 0], axis
+        )
+        results = [
+            simulate_load_shifting(
+                meter_names=meter_names[first : first + batch_size],
+                consumption=to_day_matrix(
+                    consumption_matrix(
+                        {
+                            name: self.consumption_store.get(name).hourly
+                            for name in meter_names[first : first + batch_size]
+                        },
+                        axis,
+                    ),
+                    axis,
+                )[0],
+                spot_price=spot_price,
+                shares=shares,
+                max_kwh_per_hour=max_kwh_per_hour,
+                allowed_hours=allowed_hours,
+            )
+            for first in range(0, len(meter_names), batch_size)
+        ]
+        instrumentation.add_rows(len(meter_names))
+        return LoadShiftingResult.concatenate(results)
+
+    def get_cost_comparison(
+        self,
+        fastpris_in_NOK: float,
+        meter_name: str = "Trydal_1",
+        price_area: str = "NO1",
+        start: datetime = HISTORY_START,
+        end: datetime = HISTORY_END,
+    ) -> dict[str, pd.DataFrame]:
+        """
+        Compare the cost of spot price with strømstøtte against Norgespris.
+
+        Returns:
+        --------
+        Dictionary with the hourly costs ("original") and the costs summed per
+        "hour", "day", "month" and "year". The index is naive UTC, so it can be
+        sliced with the dates from the date-picker.
+        """
+        return self.get_parametric_comparison(
+            meter_name=meter_name, price_area=price_area, start=start, end=end
+        ).with_fastpris(fastpris_in_NOK)
+
+    def get_parametric_comparison(
+        self,
+        meter_name: str = "Trydal_1",
+        price_area: str = "NO1",
+        start: datetime = HISTORY_START,
+        end: datetime = HISTORY_END,
+    ) -> CostComparison:
+        """
+        Spot cost and consumption of the meter, from which the cost with any
+        Norgespris is derived without recomputation, see CostComparison.
+
+        The result is cached within a memory budget, and identical concurrent calls
+        are computed once and share the result. A result is not cached if prices or
+        readings were appended while it was computed, as it may not include them and
+        would not be extended with them, see _extend_comparisons.
+        """
+        self.refresh_if_due()
+        key = (self.fetcher.path_to_norway_data, meter_name, price_area, start, end)
+        comparison = self.cost_comparisons.get(key)
+        if comparison is None:
+            generation = self._generation
+            comparison = cost_comparison_flight.do(
+                (*key, id(self), generation),
+                self._compute_parametric_comparison,
+                meter_name,
+                price_area,
+                start,
+                end,
+            )
+            with self._generation_lock:
+                if generation == self._generation:
+                    self.cost_comparisons.put(key, comparison)
+        return comparison
+
+    @instrumentation.instrumented("refresh")
+    def refresh(self) -> dict[str, int]:
+        """
+        Add the prices in new or replaced price files and the readings in new Elhub
+        exports of the meters in memory, with append_prices and append_readings, so
+        that a long-lived Backend sees new data without a restart.
+
+        Returns:
+        --------
+        Number of new or changed hours per price area, and of readings read per
+        meter, for the areas and meters with new data.
+        """
+        refreshed = {}
+        if hasattr(self, "price_matrix"):
+            for price_area, prices in self.price_matrix.changed_prices().items():
+                self.append_prices(price_area, prices)
+                refreshed[price_area] = len(prices)
+        for meter_name, exports in self.consumption_store.new_exports().items():
+            readings = pd.concat(
+                [read_elhub_file(export) for export in exports], ignore_index=True
+            )
+            self.append_readings(meter_name, readings)
+            refreshed[meter_name] = len(readings)
+        return refreshed
+
+    def refresh_if_due(self) -> None:
+        """
+        refresh if it has not run for refresh_interval seconds. Runs in the calling
+        thread, other threads do not wait for it. A failing refresh is logged and
+        tried again after the interval.
+        """
+        if time.monotonic() - self._last_refresh < self.refresh_interval:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_refresh = time.monotonic()
+            self.refresh()
+        except Exception:
+            logger.exception("Refreshing prices and meter readings failed")
+        finally:
+            self._refresh_lock.release()
+
+    @instrumentation.instrumented("append_prices")
+    def append_prices(
+        self, price_area: str, prices: list[tuple[datetime, float]]
+    ) -> None:
+        """
+        Add new spot prices in EUR/MWh, e.g. read with read_price_file from a file
+        with the next day. The price files are not changed, the prices are only kept
+        in memory. Replaced price files are added by refresh.
+
+        The cached comparisons of the price area are extended with the new hours
+        instead of being computed again, see _extend_comparisons.
+        """
+        if not prices:
+            return
+        self.price_matrix.append(price_area, prices)
+        instrumentation.add_rows(len(prices))
+        self._next_generation()
+        hours = pd.DatetimeIndex([time for time, _ in prices]).tz_convert("UTC")
+        self._extend_comparisons(lambda key: key[2] == price_area, hours)
+
+    @instrumentation.instrumented("append_readings")
+    def append_readings(self, meter_name: str, readings: pd.DataFrame) -> None:
+        """
+        Add new readings of a meter, e.g. read with read_elhub_file from the latest
+        Elhub export, without reading the existing exports again. Keep the export in
+        the data folder of the meter, so that the readings are also there when the
+        meter is read again. Exports put in the data folder are added by refresh.
+
+        The cached comparisons of the meter are extended with the new hours instead
+        of being computed again, see _extend_comparisons.
+        """
+        added = self.consumption_store.append(meter_name, readings)
+        instrumentation.add_rows(len(added))
+        self.load_shape_index = None
+        self._next_generation()
+        self._extend_comparisons(lambda key: key[1] == meter_name, added.index)
+
+    def _next_generation(self) -> None:
+        """Called after new data is in place, before the cache is extended with it."""
+        with self._generation_lock:
+            self._generation += 1
+
+    def _extend_comparisons(
+        self, is_affected: Callable[[Hashable], bool], hours: pd.DatetimeIndex
+    ) -> None:
+        """
+        Extend the cached comparisons whose key matches is_affected and whose period
+        contains any of hours. A comparison is extended if all hours are after its
+        last hour, otherwise (e.g. a corrected price) it is removed from the cache.
+        """
+        for key, comparison in self.cost_comparisons.entries(is_affected):
+            _, meter_name, price_area, start, end = key
+            new_hours = hours[(hours >= start) & (hours <= end)]
+            if new_hours.empty:
+                continue
+            if (
+                not comparison.hourly.empty
+                and new_hours.min().tz_convert(None) <= comparison.hourly.index[-1]
+            ):
+                self.cost_comparisons.invalidate(lambda cached_key: cached_key == key)
+                continue
+
+            consumption = (
+                self.consumption_store.get(meter_name)
+                .hourly.reindex(new_hours)
+                .dropna()
+            )
+            prices_in_eur = self.price_matrix.get(areas=[price_area]).reindex(
+                consumption.index
+            )[:, PRICE_AREAS.index(price_area)]
+            spot_cost = consumption * calculate_stroemstoette_array(
+                prices_in_eur * NOK_PER_EUR / 1e3
+            )
+            self.cost_comparisons.put(
+                key, comparison.append(spot_cost.dropna(), consumption)
+            )
+
+    def _spot_price_array(
+        self, axis: pd.DatetimeIndex, price_areas: list[str]
+    ) -> np.ndarray:
+        """
+        Spot price with strømstøtte in NOK/kWh as (hours x price_areas) for every
+        hour of axis, NaN where there is no price.
+        """
+        matrix = self.price_matrix.get(areas=price_areas)
+        columns = [matrix.areas.index(price_area) for price_area in price_areas]
+        prices_in_eur = matrix.reindex(axis)[:, columns]
+        return calculate_stroemstoette_array(prices_in_eur * NOK_PER_EUR / 1e3)
+
+    @instrumentation.instrumented("cost_comparison")
+    def _compute_parametric_comparison(
+        self,
+        meter_name: str,
+        price_area: str,
+        start: datetime,
+        end: datetime,
+    ) -> CostComparison:
+        spot_cost = self.get_spotpris_cost_per_hour(
+            start=start, end=end, meter_name=meter_name, price_area=price_area
         )
+        consumption = self.consumption_store.get(meter_name).series(start, end)
+
+        with instrumentation.stage("resample") as stage:
+            stage.add_rows(len(spot_cost))
+            return CostComparison.from_hourly(spot_cost, consumption)
 
     @staticmethod
+    @instrumentation.instrumented("calculate_consumption_cost")
     def _calculate_consumption_cost_per_hour(
-        consumption_data: pd.DataFrame,
+        consumption: pd.Series,
         price_per_kwh: list[tuple[datetime, float]],
-        start: datetime,
-        end: datetime,
-        consumption_column: str = "KWH 60 Forbruk",
-        time_column: str = "Fra",
     ) -> pd.Series:
         """
         Multiply consumption values by time-based price factors to calculate cost.
 
         Parameters:
         -----------
-        consumption_data : DataFrame
-            Meter reading data containing consumption values
+        consumption : Series
+            Consumption in kWh indexed by the hour in UTC, see MeterConsumption
         price_per_kwh : list[Tuple[datetime, float]]
             list of tuples containing (timestamp, price) pairs
-        consumption_column : str, optional
-            Name of the column containing consumption values, default is "KWH 60 Forbruk"
-        cost_column : str, optional
-            Name of the column to store the calculated cost, default is "Cost"
-        time_column : str, optional
-            Name of the column containing timestamps, default is "Fra"
 
         Returns:
         --------
-        Series with cost per hour
+        Series with cost per hour, for the hours with both consumption and price
         """
+        price_per_kwh_series = pd.Series(dict(price_per_kwh), dtype=float)
 
-        consumption: list[tuple[datetime, float]] = [
-            (time, value)
-            for timestamp, value in zip(
-                consumption_data[time_column],
-                consumption_data[consumption_column],
-                strict=True,
-            )
-            if (time := timestamp.to_pydatetime().replace(tzinfo=ZoneInfo("UTC")))
-            >= start
-            and time <= end
-        ]
-
-        consumption = sorted(consumption, key=lambda value: value[0])
-
-        consumption_series = pd.Series(dict(consumption))
-        price_per_kwh_series = pd.Series(dict(price_per_kwh))
-
-        consumption_series, price_per_kwh_series = consumption_series.align(
+        consumption_series, price_per_kwh_series = consumption.align(
             price_per_kwh_series, join="inner"
         )
 
+        instrumentation.add_rows(len(consumption_series))
         return consumption_series * price_per_kwh_series
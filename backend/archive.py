@@ -0,0 +1,284 @@
+"""
+Compact archive format for hourly meter readings and spot prices.
+
+A series is split into chunks of CHUNK_SIZE values, which are compressed
+separately:
+
+    - the times as the first time, the first difference and the differences of
+      the differences (delta-of-delta), which are 0 for a regular hourly series
+    - the values as fixed-point integers and their differences if they have at most
+      MAX_DECIMALS decimals, like the readings in the Elhub exports, otherwise as the
+      XOR of the bits of consecutive floats
+
+The integers are zigzag encoded, stored with the smallest of 1, 2, 4 or 8 bytes
+which fits all of them, and the chunk is compressed with zlib, which removes the
+many zero bytes left by the encoding.
+
+File layout:
+
+    MAGIC | chunk | chunk | ... | index (JSON) | index offset and length | MAGIC
+
+The index holds the position, number of values, first and last time and minimum and
+maximum value of every chunk, so that reading a time window only decodes the chunks
+which overlap it.
+
+Can be run as a script to archive all meters, and the prices if
+PATH_TO_NORWAY_PRICES is set:
+
+    python -m backend.archive --output archive
+"""
+
+import argparse
+import json
+import os
+import struct
+import zlib
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b"GNTS"
+VERSION = 1
+CHUNK_SIZE = 24 * 7 * 4  # four weeks of hourly values
+MAX_DECIMALS = 6
+SUFFIX = ".gnts"
+
+# first time, first time difference, decimals (-1 for XOR encoded floats)
+_CHUNK_HEADER = struct.Struct("<qqb")
+_FIRST_VALUE = struct.Struct("<q")
+_FOOTER = struct.Struct("<QQ4s")
+
+
+@dataclass
+class ChunkInfo:
+    offset: int
+    length: int
+    count: int
+    start: int  # seconds since epoch, UTC
+    end: int
+    min: float | None  # None if all values are NaN
+    max: float | None
+
+
+def write_archive(
+    path: Path,
+    series: pd.Series,
+    chunk_size: int = CHUNK_SIZE,
+    metadata: dict[str, str] | None = None,
+) -> Path:
+    """
+    Args:
+        path:
+            File to write, the parent folder is created if it does not exist.
+        series:
+            Values indexed by time, a naive index is read as UTC.
+        chunk_size:
+            Number of values per chunk.
+        metadata:
+            Stored in the index, e.g. meter name or price area.
+    """
+    series = series.sort_index()
+    index = pd.DatetimeIndex(series.index)
+    if index.tz is None:
+        index = index.tz_localize("UTC")
+    seconds = index.tz_convert("UTC").as_unit("s").asi8
+    values = series.to_numpy(dtype=float)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    chunks = []
+    with open(path, "wb") as file:
+        file.write(MAGIC)
+        for first in range(0, len(values), chunk_size):
+            chunk_seconds = seconds[first : first + chunk_size]
+            chunk_values = values[first : first + chunk_size]
+            payload = _encode_chunk(chunk_seconds, chunk_values)
+            has_value = not np.isnan(chunk_values).all()
+            chunks.append(
+                ChunkInfo(
+                    offset=file.tell(),
+                    length=len(payload),
+                    count=len(chunk_values),
+                    start=int(chunk_seconds[0]),
+                    end=int(chunk_seconds[-1]),
+                    min=float(np.nanmin(chunk_values)) if has_value else None,
+                    max=float(np.nanmax(chunk_values)) if has_value else None,
+                )
+            )
+            file.write(payload)
+
+        index_offset = file.tell()
+        index_bytes = json.dumps(
+            {
+                "version": VERSION,
+                "name": series.name,
+                "metadata": metadata or {},
+                "chunks": [asdict(chunk) for chunk in chunks],
+            }
+        ).encode()
+        file.write(index_bytes)
+        file.write(_FOOTER.pack(index_offset, len(index_bytes), MAGIC))
+    return path
+
+
+def read_archive_index(path: Path) -> tuple[dict, list[ChunkInfo]]:
+    """The index of an archive, as written by write_archive, and its chunks."""
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an archive")
+        file.seek(-_FOOTER.size, os.SEEK_END)
+        index_offset, index_length, magic = _FOOTER.unpack(file.read(_FOOTER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is truncated")
+        file.seek(index_offset)
+        index = json.loads(file.read(index_length))
+    if index["version"] != VERSION:
+        raise ValueError(f"Unsupported archive version {index['version']}")
+    return index, [ChunkInfo(**chunk) for chunk in index.pop("chunks")]
+
+
+def read_archive(
+    path: Path, start: datetime | None = None, end: datetime | None = None
+) -> pd.Series:
+    """
+    Read back a series written by write_archive, indexed by time in UTC. If start
+    and/or end is given (naive is read as UTC), only the values within [start, end]
+    are returned, and only the chunks which overlap the window are decoded.
+    """
+    index, chunks = read_archive_index(path)
+    first = -np.inf if start is None else _to_seconds(start)
+    last = np.inf if end is None else _to_seconds(end)
+    chunks = [chunk for chunk in chunks if chunk.end >= first and chunk.start <= last]
+
+    seconds, values = [np.empty(0, dtype=np.int64)], [np.empty(0)]
+    with open(path, "rb") as file:
+        for chunk in chunks:
+            file.seek(chunk.offset)
+            chunk_seconds, chunk_values = _decode_chunk(
+                file.read(chunk.length), chunk.count
+            )
+            seconds.append(chunk_seconds)
+            values.append(chunk_values)
+
+    all_seconds = np.concatenate(seconds)
+    in_window = (all_seconds >= first) & (all_seconds <= last)
+    return pd.Series(
+        np.concatenate(values)[in_window],
+        index=pd.to_datetime(all_seconds[in_window], unit="s", utc=True).as_unit("us"),
+        name=index["name"],
+    )
+
+
+def _to_seconds(time: datetime) -> int:
+    timestamp = pd.Timestamp(time)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize("UTC")
+    return int(timestamp.timestamp())
+
+
+def _encode_chunk(seconds: np.ndarray, values: np.ndarray) -> bytes:
+    deltas = np.diff(seconds)
+    decimals = _decimals(values)
+    parts = [
+        _CHUNK_HEADER.pack(
+            seconds[0],
+            deltas[0] if len(deltas) else 0,
+            -1 if decimals is None else decimals,
+        ),
+        _pack_ints(np.diff(deltas)),
+    ]
+    if decimals is None:
+        bits = values.view(np.uint64)
+        parts.append((bits ^ np.r_[np.uint64(0), bits[:-1]]).tobytes())
+    else:
+        fixed = np.rint(values * 10**decimals).astype(np.int64)
+        parts.append(_FIRST_VALUE.pack(fixed[0]))
+        parts.append(_pack_ints(np.diff(fixed)))
+    return zlib.compress(b"".join(parts), 9)
+
+
+def _decode_chunk(payload: bytes, count: int) -> tuple[np.ndarray, np.ndarray]:
+    buffer = zlib.decompress(payload)
+    first_second, first_delta, decimals = _CHUNK_HEADER.unpack_from(buffer)
+    offset = _CHUNK_HEADER.size
+
+    delta_of_deltas, offset = _unpack_ints(buffer, offset, max(count - 2, 0))
+    deltas = np.cumsum(np.r_[first_delta, delta_of_deltas])[: count - 1]
+    seconds = first_second + np.r_[0, np.cumsum(deltas)].astype(np.int64)
+
+    if decimals < 0:
+        xor = np.frombuffer(buffer, dtype=np.uint64, count=count, offset=offset)
+        values = np.bitwise_xor.accumulate(xor).view(np.float64)
+    else:
+        (first_value,) = _FIRST_VALUE.unpack_from(buffer, offset)
+        differences, _ = _unpack_ints(buffer, offset + _FIRST_VALUE.size, count - 1)
+        values = (first_value + np.r_[0, np.cumsum(differences)]) / 10**decimals
+    return seconds, values
+
+
+def _decimals(values: np.ndarray) -> int | None:
+    """The fewest decimals which represent all values exactly, None if there are none."""
+    if np.isnan(values).any() or np.abs(values).max(initial=0) >= 2**52 / 10**6:
+        return None
+    for decimals in range(MAX_DECIMALS + 1):
+        scale = 10**decimals
+        if np.array_equal(np.rint(values * scale) / scale, values):
+            return decimals
+    return None
+
+
+def _pack_ints(ints: np.ndarray) -> bytes:
+    """Zigzag encode and store with the smallest width, prefixed with the width."""
+    ints = ints.astype(np.int64)
+    zigzag = ((ints << 1) ^ (ints >> 63)).view(np.uint64)
+    largest = int(zigzag.max(initial=0))
+    width = next(width for width in (1, 2, 4, 8) if largest < 2 ** (8 * width))
+    return bytes([width]) + zigzag.astype(f"<u{width}").tobytes()
+
+
+def _unpack_ints(buffer: bytes, offset: int, count: int) -> tuple[np.ndarray, int]:
+    width = buffer[offset]
+    zigzag = np.frombuffer(
+        buffer, dtype=f"<u{width}", count=count, offset=offset + 1
+    ).astype(np.uint64)
+    ints = (zigzag >> np.uint64(1)).view(np.int64) ^ -(zigzag & np.uint64(1)).view(
+        np.int64
+    )
+    return ints, offset + 1 + count * width
+
+
+if __name__ == "__main__":
+    from backend.consumption_store import ConsumptionStore
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", type=Path, default=Path("archive"))
+    args = parser.parse_args()
+
+    store = ConsumptionStore()
+    for meter_name in store.meter_names():
+        file = write_archive(
+            args.output / "meters" / f"{meter_name}{SUFFIX}",
+            store.get(meter_name).hourly.rename(meter_name),
+            metadata={"meter_name": meter_name, "unit": "kWh"},
+        )
+        print(f"Wrote {file} ({file.stat().st_size} bytes)")
+
+    if "PATH_TO_NORWAY_PRICES" in os.environ:
+        from backend.adapter.price_fetcher.local_spot_price_fetcher import (
+            LocalSpotPriceFetcher,
+        )
+        from backend.price_matrix import PRICE_AREAS, PriceMatrixStore
+
+        matrix = PriceMatrixStore(
+            LocalSpotPriceFetcher(Path(os.environ["PATH_TO_NORWAY_PRICES"]))
+        ).get()
+        for price_area in PRICE_AREAS:
+            prices = pd.Series(matrix.area(price_area), index=matrix.axis).dropna()
+            file = write_archive(
+                args.output / "prices" / f"{price_area}{SUFFIX}",
+                prices.rename(price_area),
+                metadata={"price_area": price_area, "unit": "EUR/MWh"},
+            )
+            print(f"Wrote {file} ({file.stat().st_size} bytes)")
@@ -0,0 +1,95 @@
+"""
+Break-even Norgespris for a fleet of meters.
+
+The cost with Norgespris is linear in the fixed price p: sum(consumption) * p. The
+fixed price at which it equals the cost with spot price and strømstøtte is therefore
+
+    p* = sum(consumption * spot price with strømstøtte) / sum(consumption)
+
+which is computed for all meters and time windows in one pass over the
+(meters x hours) consumption matrix. Norgespris is cheaper whenever it is below p*.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from backend.timeseries import window_starts
+
+
+@dataclass
+class BreakEvenResult:
+    """Consumption, spot cost and break-even price per meter and window."""
+
+    meter_names: list[str]
+    window_starts: pd.DatetimeIndex
+    consumption: np.ndarray  # kWh, (meters x windows)
+    spot_cost: np.ndarray  # NOK, (meters x windows)
+
+    @property
+    def break_even_price(self) -> np.ndarray:
+        """Fixed price in NOK/kWh at which Norgespris costs the same as spot price."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(
+                self.consumption > 0, self.spot_cost / self.consumption, np.nan
+            )
+
+    def norgespris_cost(self, price_grid: np.ndarray) -> np.ndarray:
+        """Cost in NOK as (meters x windows x prices) for every price in price_grid."""
+        return self.consumption[..., None] * np.asarray(price_grid, dtype=float)
+
+    def savings(self, price_grid: np.ndarray) -> np.ndarray:
+        """How much cheaper Norgespris is than spot price, for every price in grid."""
+        return self.spot_cost[..., None] - self.norgespris_cost(price_grid)
+
+    def to_frame(self) -> pd.DataFrame:
+        """One row per meter and window."""
+        meters, windows = self.consumption.shape
+        return pd.DataFrame(
+            {
+                "meter": np.repeat(self.meter_names, windows),
+                "window_start": np.tile(self.window_starts, meters),
+                "consumption": self.consumption.ravel(),
+                "spot_cost": self.spot_cost.ravel(),
+                "break_even_price": self.break_even_price.ravel(),
+            }
+        )
+
+
+def solve_break_even(
+    meter_names: list[str],
+    consumption: np.ndarray,
+    spot_price: np.ndarray,
+    axis: pd.DatetimeIndex,
+    window: str = "month",
+) -> BreakEvenResult:
+    """
+    Args:
+        meter_names:
+            Name of the meter of every row in consumption.
+        consumption:
+            Consumption in kWh as (meters x hours), NaN where there is no reading.
+        spot_price:
+            Spot price with strømstøtte in NOK/kWh, either (hours,) for all meters
+            or (meters x hours), NaN where there is no price.
+        axis:
+            The hours of the columns in consumption and spot_price.
+        window:
+            "day", "month", "year" or "all", see backend.timeseries.window_starts.
+
+    Hours without reading or without price are left out of both costs, like in
+    Backend.get_cost_comparison.
+    """
+    spot_price = np.broadcast_to(spot_price, consumption.shape)
+    has_value = ~(np.isnan(consumption) | np.isnan(spot_price))
+    billed_consumption = np.where(has_value, consumption, 0.0)
+    hourly_spot_cost = billed_consumption * np.where(has_value, spot_price, 0.0)
+
+    starts, start_times = window_starts(axis, window)
+    return BreakEvenResult(
+        meter_names=list(meter_names),
+        window_starts=start_times,
+        consumption=np.add.reduceat(billed_consumption, starts, axis=1),
+        spot_cost=np.add.reduceat(hourly_spot_cost, starts, axis=1),
+    )
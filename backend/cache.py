@@ -0,0 +1,86 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Generic, TypeVar
+
+from backend.instrumentation import instrumentation
+
+V = TypeVar("V")
+
+
+class MemoryBoundedCache(Generic[V]):
+    """
+    Least recently used cache which evicts entries when the total size of the
+    cached values exceeds a memory budget.
+    """
+
+    def __init__(self, name: str, max_bytes: int, sizeof: Callable[[V], int]) -> None:
+        """
+
+        Args:
+            name:
+                Name under which hits and misses are reported to instrumentation.
+            max_bytes:
+                Memory budget. A single value larger than the budget is not cached.
+            sizeof:
+                Size of a value in bytes.
+
+        """
+        self.name = name
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[V, int]] = OrderedDict()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        instrumentation.record_cache(self.name, hit=entry is not None)
+        return entry[0] if entry is not None else None
+
+    def put(self, key: Hashable, value: V) -> None:
+        size = self.sizeof(value)
+        with self._lock:
+            self._pop(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def entries(
+        self, predicate: Callable[[Hashable], bool]
+    ) -> list[tuple[Hashable, V]]:
+        """Entries whose key matches predicate, without counting them as hits."""
+        with self._lock:
+            return [
+                (key, value)
+                for key, (value, _) in self._entries.items()
+                if predicate(key)
+            ]
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove all entries whose key matches predicate, returns how many."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._pop(key)
+        return len(keys)
+
+    def clear(self) -> None:
+        self.invalidate(lambda _: True)
+
+    def _pop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry[1]
@@ -0,0 +1,164 @@
+import glob
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+
+import pandas as pd
+
+from backend.cache import MemoryBoundedCache
+from backend.timeseries import TIME_COLUMN, hourly_consumption
+from utils.ReadElhubExport import read_elhub_data
+
+
+@dataclass
+class MeterConsumption:
+    """Readings of one meter, as read by read_elhub_data, and as an hourly series."""
+
+    readings: pd.DataFrame
+    hourly: pd.Series  # kWh, indexed by the hour in UTC
+
+    @classmethod
+    def from_readings(cls, readings: pd.DataFrame) -> "MeterConsumption":
+        return cls(readings=readings, hourly=hourly_consumption(readings))
+
+    def append(self, readings: pd.DataFrame) -> tuple["MeterConsumption", pd.Series]:
+        """
+        Add new readings, e.g. from the latest Elhub export. Hours which are already
+        there are kept, like in read_elhub_data.
+
+        Returns:
+            The extended MeterConsumption and the consumption of the added hours.
+        """
+        added = MeterConsumption.from_readings(readings).hourly
+        added = added[~added.index.isin(self.hourly.index)]
+        is_added = (
+            pd.DatetimeIndex(readings[TIME_COLUMN]).tz_localize("UTC").isin(added.index)
+        )
+        readings = readings[is_added].drop_duplicates(subset=[TIME_COLUMN], keep="last")
+
+        hourly = pd.concat([self.hourly, added])
+        if len(self.hourly) and len(added) and added.index[0] < self.hourly.index[-1]:
+            hourly = hourly.sort_index()
+        extended = MeterConsumption(
+            readings=pd.concat([self.readings, readings], ignore_index=True),
+            hourly=hourly,
+        )
+        return extended, added
+
+    def series(self, start: datetime, end: datetime) -> pd.Series:
+        """Hourly consumption from start to end (inclusive)."""
+        return self.hourly.loc[start:end]
+
+    @property
+    def nbytes(self) -> int:
+        return int(
+            self.readings.memory_usage(deep=True).sum()
+            + self.hourly.memory_usage(deep=False)
+        )
+
+
+class ConsumptionStore:
+    """
+    Reads the meter data once and keeps it in memory, within a memory budget, so
+    that it does not have to be read again for every calculation.
+    """
+
+    def __init__(
+        self, base_path: str | None = None, max_bytes: int = 256 * 2**20
+    ) -> None:
+        """
+
+        Args:
+            base_path:
+                Data directory with one folder per meter, see read_elhub_data.
+            max_bytes:
+                Memory budget, the least recently used meters are evicted first.
+
+        """
+        self.base_path = base_path
+        self._cache: MemoryBoundedCache[MeterConsumption] = MemoryBoundedCache(
+            "consumption_store", max_bytes=max_bytes, sizeof=lambda m: m.nbytes
+        )
+        self._append_lock = threading.Lock()
+        # version (mtime, size) of every export which has been read, per meter
+        self._exports: dict[str, dict[str, tuple[int, int]]] = {}
+
+    def meter_names(self) -> list[str]:
+        base_path = self._data_path()
+        return sorted(
+            d
+            for d in os.listdir(base_path)
+            if os.path.isdir(os.path.join(base_path, d))
+        )
+
+    def get(self, meter_name: str) -> MeterConsumption:
+        """Raises KeyError if there is no data for the meter."""
+        consumption = self._cache.get(meter_name)
+        if consumption is None:
+            consumption = self._read(meter_name)
+            self._cache.put(meter_name, consumption)
+        return consumption
+
+    def append(self, meter_name: str, readings: pd.DataFrame) -> pd.Series:
+        """
+        Add new readings of a meter without reading the existing ones again, returns
+        the consumption of the hours which were not there before.
+
+        If the meter is not in memory, it is read again, which already includes the
+        readings if their export has been put in the meter folder. All hours of the
+        readings are then returned, as it is not known which of them are new.
+        """
+        with self._append_lock:
+            consumption = self._cache.get(meter_name)
+            if consumption is None:
+                consumption, _ = self._read(meter_name).append(readings)
+                hours = MeterConsumption.from_readings(readings).hourly.index
+                added = consumption.hourly.reindex(hours)
+            else:
+                consumption, added = consumption.append(readings)
+            self._cache.put(meter_name, consumption)
+        return added
+
+    def new_exports(self) -> dict[str, list[str]]:
+        """
+        Exports which have been put in the folder of a meter in memory, or changed,
+        since the meter was read. Every export is only returned once, its readings
+        are expected to be added with append.
+        """
+        meter_names = [name for name, _ in self._cache.entries(lambda _: True)]
+        new_exports = {}
+        with self._append_lock:
+            for meter_name in meter_names:
+                versions = self._export_versions(meter_name)
+                known = self._exports.setdefault(meter_name, {})
+                files = [
+                    file
+                    for file, version in sorted(versions.items())
+                    if known.get(file) != version
+                ]
+                if files:
+                    known.update(versions)
+                    new_exports[meter_name] = files
+        return new_exports
+
+    def invalidate(self, meter_name: str) -> None:
+        self._cache.invalidate(lambda key: key == meter_name)
+
+    def _read(self, meter_name: str) -> MeterConsumption:
+        # the versions are taken first, an export added meanwhile is read again later
+        self._exports[meter_name] = self._export_versions(meter_name)
+        readings = read_elhub_data(base_path=self.base_path, meter_dirs=[meter_name])
+        return MeterConsumption.from_readings(readings[meter_name])
+
+    def _export_versions(self, meter_name: str) -> dict[str, tuple[int, int]]:
+        versions = {}
+        for file in glob.glob(os.path.join(self._data_path(), meter_name, "*.csv")):
+            stat = os.stat(file)
+            versions[file] = (stat.st_mtime_ns, stat.st_size)
+        return versions
+
+    def _data_path(self) -> str:
+        return self.base_path or os.path.join(
+            os.path.dirname(os.path.dirname(__file__)), "data"
+        )
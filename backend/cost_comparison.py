@@ -0,0 +1,144 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+SPOT_COLUMN = "Spotpris"
+NORGESPRIS_COLUMN = "Norgespris"
+CONSUMPTION_COLUMN = "Forbruk"
+LEVELS = {"hour": "h", "day": "D", "month": "ME", "year": "YE"}
+PERIODS = {"hour": "h", "day": "D", "month": "M", "year": "Y"}
+
+
+@dataclass
+class CostComparison:
+    """
+    Spot cost and consumption of one meter in one price area, per hour and summed
+    per hour/day/month/year.
+
+    The cost with Norgespris is linear in the fixed price, so it is not stored but
+    derived by scaling the consumption. This makes a new fixed price cheap, and one
+    CostComparison serves every fixed price.
+    """
+
+    hourly: pd.DataFrame  # SPOT_COLUMN in NOK and CONSUMPTION_COLUMN in kWh
+    rollups: dict[str, pd.DataFrame]
+    cumulative: np.ndarray  # prefix sums of hourly, with a leading row of zeros
+
+    @classmethod
+    def from_hourly(
+        cls, spot_cost: pd.Series, consumption: pd.Series
+    ) -> "CostComparison":
+        """
+        Args:
+            spot_cost:
+                Cost per hour with spot price and strømstøtte.
+            consumption:
+                Consumption per hour. Only hours which are in both series are used.
+        """
+        hourly = pd.concat([spot_cost, consumption], axis=1, join="inner").astype(float)
+        hourly.columns = [SPOT_COLUMN, CONSUMPTION_COLUMN]
+        if not isinstance(hourly.index, pd.DatetimeIndex):
+            raise ValueError("Data index must be a DatetimeIndex.")
+
+        # removing timezone because of interactive date-picker, can be readded later
+        hourly.index = hourly.index.tz_convert(None)
+        cumulative = np.vstack(
+            [np.zeros((1, 2)), np.nancumsum(hourly.to_numpy(), axis=0)]
+        )
+        return cls(
+            hourly=hourly,
+            rollups={
+                level: hourly.resample(freq).sum() for level, freq in LEVELS.items()
+            },
+            cumulative=cumulative,
+        )
+
+    def append(self, spot_cost: pd.Series, consumption: pd.Series) -> "CostComparison":
+        """
+        Extend with hours after the last hour, e.g. a new day of prices and readings.
+        Only the new hours are summed: the prefix sums continue from the last row,
+        and of the rollups only the last period, which the new hours can complete,
+        is summed again.
+
+        Args:
+            spot_cost, consumption:
+                Like in from_hourly, for the new hours only.
+
+        Raises:
+            ValueError if any of the hours is not after the last hour.
+        """
+        added = CostComparison.from_hourly(spot_cost, consumption).hourly
+        if added.empty:
+            return self
+        if self.hourly.empty:
+            return CostComparison.from_hourly(spot_cost, consumption)
+        if added.index[0] <= self.hourly.index[-1]:
+            raise ValueError("Can only append hours after the last hour")
+
+        hourly = pd.concat([self.hourly, added])
+        rollups = {}
+        for level, freq in LEVELS.items():
+            last_period = self.hourly.index[-1].to_period(PERIODS[level]).start_time
+            tail = hourly.loc[last_period:].resample(freq).sum()
+            rollups[level] = pd.concat([self.rollups[level].iloc[:-1], tail])
+        cumulative = np.vstack(
+            [
+                self.cumulative,
+                self.cumulative[-1] + np.nancumsum(added.to_numpy(), axis=0),
+            ]
+        )
+        return CostComparison(hourly=hourly, rollups=rollups, cumulative=cumulative)
+
+    def with_fastpris(self, fastpris_in_NOK: float) -> dict[str, pd.DataFrame]:
+        """
+        Cost with spot price and with Norgespris, as returned by
+        Backend.get_cost_comparison.
+        """
+        return {
+            level: self._scale(data, fastpris_in_NOK)
+            for level, data in [("original", self.hourly), *self.rollups.items()]
+        }
+
+    def totals(
+        self,
+        fastpris_in_NOK: float,
+        start: datetime | None = None,
+        end: datetime | None = None,
+    ) -> dict[str, float]:
+        """
+        Total spot cost, Norgespris cost and consumption from start to end (both
+        inclusive, naive UTC), from the prefix sums without summing the hours.
+        """
+        index = self.hourly.index
+        first = 0 if start is None else index.searchsorted(pd.Timestamp(start), "left")
+        last = (
+            len(index)
+            if end is None
+            else index.searchsorted(pd.Timestamp(end), "right")
+        )
+        spot_cost, consumption = (
+            self.cumulative[max(last, first)] - self.cumulative[first]
+        )
+        return {
+            SPOT_COLUMN: float(spot_cost),
+            NORGESPRIS_COLUMN: float(consumption * fastpris_in_NOK),
+            CONSUMPTION_COLUMN: float(consumption),
+        }
+
+    @property
+    def nbytes(self) -> int:
+        frames = [self.hourly, *self.rollups.values()]
+        return int(
+            sum(frame.memory_usage().sum() for frame in frames) + self.cumulative.nbytes
+        )
+
+    @staticmethod
+    def _scale(data: pd.DataFrame, fastpris_in_NOK: float) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                SPOT_COLUMN: data[SPOT_COLUMN],
+                NORGESPRIS_COLUMN: data[CONSUMPTION_COLUMN] * fastpris_in_NOK,
+            }
+        )
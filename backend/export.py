@@ -0,0 +1,206 @@
+"""
+Export of computed cost series to Arrow IPC or Parquet files, and reading them back.
+
+A cost comparison (see Backend.get_cost_comparison) is written as one file per
+level, e.g.
+
+    results/Trydal_1/NO2/fastpris=0.4/
+        |-- original.parquet
+        |-- hour.parquet
+        |-- day.parquet
+        |-- month.parquet
+        |-- year.parquet
+
+Arrow IPC files are written uncompressed by default, so they can be memory-mapped
+and read without copying. Parquet files are compressed and split into row groups
+with statistics on the time column, so a read of a time window skips the row groups
+outside of it.
+
+Can be run as a script to precompute a comparison:
+
+    python -m backend.export --meter Trydal_1 --price-area NO2 --fastpris 0.4
+"""
+
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import Literal
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+TIME_COLUMN = "time"
+LEVELS = ["original", "hour", "day", "month", "year"]
+# one month of hourly values per row group / record batch
+ROWS_PER_GROUP = 24 * 31
+
+ExportFormat = Literal["parquet", "arrow"]
+SUFFIXES = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def cost_comparison_path(
+    base_path: Path, meter_name: str, price_area: str, fastpris_in_NOK: float
+) -> Path:
+    return base_path / meter_name / price_area / f"fastpris={fastpris_in_NOK:g}"
+
+
+def frame_to_table(
+    data: pd.DataFrame, metadata: dict[str, str] | None = None
+) -> pa.Table:
+    """Convert a time-indexed DataFrame to a table with the index as first column."""
+    table = pa.Table.from_pandas(
+        data.rename_axis(TIME_COLUMN).reset_index(), preserve_index=False
+    )
+    if metadata:
+        table = table.replace_schema_metadata(
+            {**(table.schema.metadata or {}), **metadata}
+        )
+    return table
+
+
+def frame_to_arrow(data: pd.DataFrame) -> bytes:
+    """Serialize a time-indexed DataFrame as an Arrow IPC stream."""
+    table = frame_to_table(data)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def export_cost_comparison(
+    data: dict[str, pd.DataFrame],
+    path: Path,
+    export_format: ExportFormat = "parquet",
+    compression: str | None = None,
+    metadata: dict[str, str] | None = None,
+) -> list[Path]:
+    """
+    Write every level of a cost comparison to its own file in path.
+
+    Args:
+        data:
+            As returned by Backend.get_cost_comparison.
+        path:
+            Folder to write to, created if it does not exist.
+        export_format:
+            "parquet" or "arrow" (Arrow IPC file format).
+        compression:
+            Codec, e.g. "zstd", "lz4" or "snappy". Defaults to "zstd" for Parquet
+            and to no compression for Arrow, which keeps the files memory-mappable
+            without copies.
+        metadata:
+            Stored in the schema of every file, e.g. meter name and price area.
+
+    Returns:
+        The written files.
+    """
+    path.mkdir(parents=True, exist_ok=True)
+    files = []
+    for level, frame in data.items():
+        table = frame_to_table(frame, metadata={"level": level, **(metadata or {})})
+        file = path / f"{level}{SUFFIXES[export_format]}"
+        if export_format == "parquet":
+            pq.write_table(
+                table,
+                file,
+                compression=compression or "zstd",
+                row_group_size=ROWS_PER_GROUP,
+                write_statistics=[TIME_COLUMN],
+            )
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=compression)
+            with pa.ipc.new_file(file, table.schema, options=options) as writer:
+                writer.write_table(table, max_chunksize=ROWS_PER_GROUP)
+        files.append(file)
+    return files
+
+
+def read_table(
+    file: Path, start: datetime | None = None, end: datetime | None = None
+) -> pa.Table:
+    """
+    Read an exported file, memory-mapped. If start and/or end is given, only rows
+    within [start, end] are returned, and for Parquet only the row groups which
+    overlap the window are read.
+    """
+    filters = []
+    if start is not None:
+        filters.append((TIME_COLUMN, ">=", pd.Timestamp(start)))
+    if end is not None:
+        filters.append((TIME_COLUMN, "<=", pd.Timestamp(end)))
+
+    if file.suffix == SUFFIXES["parquet"]:
+        return pq.read_table(file, memory_map=True, filters=filters or None)
+
+    with pa.memory_map(str(file)) as source:
+        table = pa.ipc.open_file(source).read_all()
+    for column, operator, value in filters:
+        compare = pc.greater_equal if operator == ">=" else pc.less_equal
+        table = table.filter(
+            compare(table[column], pa.scalar(value, table[column].type))
+        )
+    return table
+
+
+def read_cost_comparison(
+    path: Path, start: datetime | None = None, end: datetime | None = None
+) -> dict[str, pd.DataFrame]:
+    """Read back the levels written by export_cost_comparison."""
+    data = {}
+    for level in LEVELS:
+        files = [path / f"{level}{suffix}" for suffix in SUFFIXES.values()]
+        file = next((file for file in files if file.exists()), None)
+        if file is None:
+            continue
+        data[level] = (
+            read_table(file, start=start, end=end).to_pandas().set_index(TIME_COLUMN)
+        )
+    if not data:
+        raise ValueError(f"No exported cost comparison in {path=}")
+    return data
+
+
+def read_metadata(file: Path) -> dict[str, str]:
+    """The metadata passed to export_cost_comparison, plus the level of the file."""
+    if file.suffix == SUFFIXES["parquet"]:
+        schema = pq.read_schema(file)
+    else:
+        with pa.memory_map(str(file)) as source:
+            schema = pa.ipc.open_file(source).schema
+    return {
+        key.decode(): value.decode()
+        for key, value in (schema.metadata or {}).items()
+        if key != b"pandas"
+    }
+
+
+if __name__ == "__main__":
+    from backend.app import Backend
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--meter", default="Trydal_1")
+    parser.add_argument("--price-area", default="NO1")
+    parser.add_argument("--fastpris", type=float, default=0.4, help="NOK/kWh")
+    parser.add_argument("--output", type=Path, default=Path("results"))
+    parser.add_argument("--format", choices=list(SUFFIXES), default="parquet")
+    args = parser.parse_args()
+
+    comparison = Backend().get_cost_comparison(
+        fastpris_in_NOK=args.fastpris,
+        meter_name=args.meter,
+        price_area=args.price_area,
+    )
+    written = export_cost_comparison(
+        comparison,
+        cost_comparison_path(args.output, args.meter, args.price_area, args.fastpris),
+        export_format=args.format,
+        metadata={
+            "meter_name": args.meter,
+            "price_area": args.price_area,
+            "fastpris_in_NOK": str(args.fastpris),
+        },
+    )
+    for file in written:
+        print(f"Wrote {file}")
@@ -0,0 +1,215 @@
+"""
+Grid tariff (nettleie) for a fleet of meters.
+
+The tariff has two parts:
+
+    - a capacity component (kapasitetsledd), a monthly price which depends on the
+      step in which the average of the three highest daily peaks of the month falls
+    - an energy component (energiledd), a price per kWh which depends on the hour
+
+Tariff tables are JSON files, by default in backend/tariffs/:
+
+    {
+        "name": "...",
+        "energy_price": [...],  # NOK/kWh for every hour of the day, 24 values
+        "capacity_steps": [
+            {"up_to_kw": 2, "monthly_price": 120},
+            ...
+            {"up_to_kw": null, "monthly_price": 5000}
+        ]
+    }
+
+A step applies when the average peak is at most up_to_kw, the last step (null) has
+no upper limit.
+
+All meters, days and months are computed in one pass over the (meters x days x 24)
+consumption array, without Python loops over days. Like in Backend, the hours are in
+UTC.
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from backend.timeseries import to_day_matrix
+
+TARIFF_DIR = Path(__file__).parent / "tariffs"
+PEAKS_PER_MONTH = 3
+
+
+@dataclass
+class GridTariff:
+    name: str
+    energy_price: np.ndarray  # NOK/kWh, (24,)
+    step_limits: np.ndarray  # kW, upper limit of every capacity step, inf for last
+    step_prices: np.ndarray  # NOK/month of every capacity step
+
+    @classmethod
+    def from_file(cls, path: str | os.PathLike) -> "GridTariff":
+        """Read a tariff table, see the module docstring for the format."""
+        with open(path, encoding="utf-8") as file:
+            table = json.load(file)
+
+        energy_price = np.asarray(table["energy_price"], dtype=float)
+        if energy_price.shape != (24,):
+            raise ValueError(f"{path}: energy_price must have 24 values")
+
+        steps = table["capacity_steps"]
+        step_limits = np.array(
+            [
+                np.inf if step["up_to_kw"] is None else step["up_to_kw"]
+                for step in steps
+            ],
+            dtype=float,
+        )
+        if not steps or np.any(np.diff(step_limits) <= 0) or step_limits[-1] != np.inf:
+            raise ValueError(
+                f"{path}: capacity_steps must be increasing and end without limit"
+            )
+        return cls(
+            name=table.get("name", Path(path).stem),
+            energy_price=energy_price,
+            step_limits=step_limits,
+            step_prices=np.array([step["monthly_price"] for step in steps], float),
+        )
+
+
+def available_tariffs(tariff_dir: Path = TARIFF_DIR) -> list[str]:
+    return sorted(path.stem for path in tariff_dir.glob("*.json"))
+
+
+def load_tariff(name: str, tariff_dir: Path = TARIFF_DIR) -> GridTariff:
+    """Raises KeyError if there is no table with the name in tariff_dir."""
+    path = tariff_dir / f"{name}.json"
+    if not path.is_file():
+        raise KeyError(name)
+    return GridTariff.from_file(path)
+
+
+@dataclass
+class GridTariffResult:
+    """Grid tariff per meter and month."""
+
+    meter_names: list[str]
+    months: pd.DatetimeIndex
+    peak_kw: np.ndarray  # average of the highest daily peaks, (meters x months)
+    capacity_step: np.ndarray  # index in the tariff steps, -1 if no readings
+    capacity_cost: np.ndarray  # NOK, (meters x months)
+    energy_cost: np.ndarray  # NOK, (meters x months)
+
+    @property
+    def total_cost(self) -> np.ndarray:
+        return self.capacity_cost + self.energy_cost
+
+    def to_frame(self) -> pd.DataFrame:
+        """One row per meter and month."""
+        meters, months = self.peak_kw.shape
+        return pd.DataFrame(
+            {
+                "meter": np.repeat(self.meter_names, months),
+                "month": np.tile(self.months, meters),
+                "peak_kw": self.peak_kw.ravel(),
+                "capacity_step": self.capacity_step.ravel(),
+                "capacity_cost": self.capacity_cost.ravel(),
+                "energy_cost": self.energy_cost.ravel(),
+                "total_cost": self.total_cost.ravel(),
+            }
+        )
+
+
+def monthly_peaks(
+    daily_peaks: np.ndarray, days: pd.DatetimeIndex, k: int = PEAKS_PER_MONTH
+) -> tuple[np.ndarray, pd.DatetimeIndex]:
+    """
+    Average of the k highest daily peaks of every month.
+
+    Args:
+        daily_peaks:
+            Highest hourly consumption of every day as (..., days), NaN if the day
+            has no readings.
+        days:
+            The consecutive days of the last axis of daily_peaks.
+
+    Returns:
+        The average as (..., months), NaN for months without readings, and the
+        start of every month. Months with fewer than k days with readings are
+        averaged over the days there are.
+    """
+    month_codes = days.tz_convert(None).to_period("M").asi8
+    month = month_codes - month_codes[0]
+    months = pd.date_range(
+        days[0].tz_convert(None).to_period("M").to_timestamp(),
+        periods=month[-1] + 1,
+        freq="MS",
+        tz=days.tz,
+    )
+
+    # (..., months x 31) with -inf on days which do not exist or have no readings,
+    # so that they are never among the highest
+    by_month = np.full((*daily_peaks.shape[:-1], len(months), 31), -np.inf, dtype=float)
+    by_month[..., month, days.day - 1] = np.where(
+        np.isnan(daily_peaks), -np.inf, daily_peaks
+    )
+
+    highest_index = np.argpartition(by_month, -k, axis=-1)[..., -k:]
+    highest = np.take_along_axis(by_month, highest_index, axis=-1)
+    has_value = np.isfinite(highest)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        average = np.where(has_value, highest, 0.0).sum(axis=-1) / has_value.sum(
+            axis=-1
+        )
+    return average, months
+
+
+def calculate_grid_tariff(
+    meter_names: list[str],
+    consumption: np.ndarray,
+    axis: pd.DatetimeIndex,
+    tariff: GridTariff,
+) -> GridTariffResult:
+    """
+    Args:
+        meter_names:
+            Name of the meter of every row in consumption.
+        consumption:
+            Consumption in kWh as (meters x hours), NaN where there is no reading.
+            As the readings are hourly, the consumption of an hour is also the
+            average power in kW.
+        axis:
+            The hours of the columns in consumption.
+        tariff:
+            The tariff table.
+
+    The capacity component is charged for the whole month, also for months which
+    are only partly in axis.
+    """
+    by_day, days = to_day_matrix(consumption, axis)
+    has_reading = ~np.isnan(by_day)
+
+    daily_peak = np.where(has_reading, by_day, -np.inf).max(axis=-1)
+    daily_peak[np.isinf(daily_peak)] = np.nan
+    peak_kw, months = monthly_peaks(daily_peak, days)
+
+    capacity_step = np.searchsorted(tariff.step_limits, np.nan_to_num(peak_kw))
+    capacity_step = np.where(np.isnan(peak_kw), -1, capacity_step)
+    capacity_cost = np.where(capacity_step >= 0, tariff.step_prices[capacity_step], 0.0)
+
+    daily_energy_cost = (np.where(has_reading, by_day, 0.0) * tariff.energy_price).sum(
+        axis=-1
+    )
+    month_codes = days.tz_convert(None).to_period("M").asi8
+    month_starts = np.flatnonzero(np.r_[True, month_codes[1:] != month_codes[:-1]])
+    energy_cost = np.add.reduceat(daily_energy_cost, month_starts, axis=-1)
+
+    return GridTariffResult(
+        meter_names=list(meter_names),
+        months=months,
+        peak_kw=peak_kw,
+        capacity_step=capacity_step,
+        capacity_cost=capacity_cost,
+        energy_cost=energy_cost,
+    )
@@ -0,0 +1,362 @@
+"""
+Instrumentation of the backend pipeline.
+
+Code reports what it is doing through the process-wide `instrumentation` object:
+
+    @instrumentation.instrumented("read_elhub_data")
+    def read_elhub_data(...):
+        ...
+        instrumentation.add_bytes(os.path.getsize(csv_file))
+        instrumentation.add_rows(len(df))
+
+or, for a part of a function, `with instrumentation.stage("resample"): ...`.
+
+Timings, rows and bytes are always recorded, as they are cheap. Everything which
+costs something is opt-in through environment variables, so it can be switched on in
+production without code changes:
+
+    GNISTEN_METRICS
+        Comma separated list of exporters: "log", "json:<path>" and/or
+        "prometheus:<path>". Paths may contain "{pid}" to give every worker process
+        its own file. The exporters are called from a background thread every
+        GNISTEN_FLUSH_SECONDS (default 10) if a stage has finished since the last
+        export, never on the thread of a request. They are also called when the
+        process exits normally. Pool workers leave through os._exit, which skips
+        atexit, so they need a finalizer of their own, see backend.api._init_worker.
+        A forked process starts with empty metrics and its own background threads.
+    GNISTEN_TRACE_MEMORY
+        Set to "1" to record the peak memory of every stage with tracemalloc. The
+        peak is process-wide, so concurrent stages are included in each other.
+    GNISTEN_PROFILE
+        Path of a file to which a sampling profiler writes the stacks of threads
+        inside stages, in the collapsed format read by flamegraph.pl and speedscope.
+        It is written together with the exporters.
+"""
+
+import atexit
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from functools import wraps
+from pathlib import Path
+from types import FrameType
+from typing import Any, TypeVar
+
+from backend.adapter.metrics_exporter.json_file_exporter import JsonFileExporter
+from backend.adapter.metrics_exporter.log_exporter import LogExporter
+from backend.adapter.metrics_exporter.prometheus_exporter import PrometheusExporter
+from backend.ports.metrics_exporter import MetricsExporter
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    rows: int = 0
+    bytes_read: int = 0
+    peak_memory_bytes: int = 0
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class Stage:
+    """Handle of a running stage, used to report how much it processed."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.rows = 0
+        self.bytes_read = 0
+        self.peak_memory_bytes = 0
+        self._peak_traced = 0
+
+    def add_rows(self, rows: int) -> None:
+        self.rows += rows
+
+    def add_bytes(self, bytes_read: int) -> None:
+        self.bytes_read += bytes_read
+
+
+class SamplingProfiler:
+    """Periodically samples the stacks of the threads which are inside a stage."""
+
+    def __init__(self, path: Path, interval: float = 0.005) -> None:
+        self.path = Path(path)  # "{pid}" is filled in when writing
+        self.interval = interval
+        self._reset()
+
+    def _reset(self) -> None:
+        """Start without samples and sampler thread, also in a forked process."""
+        self._lock = threading.Lock()
+        self._threads: set[int] = set()
+        self._samples: Counter[str] = Counter()
+        self._sampler: threading.Thread | None = None
+        self._active = threading.Event()
+
+    def add_thread(self, thread_id: int) -> None:
+        with self._lock:
+            self._threads.add(thread_id)
+            self._active.set()
+            if self._sampler is None:
+                self._sampler = threading.Thread(
+                    target=self._run, name="SamplingProfiler", daemon=True
+                )
+                self._sampler.start()
+
+    def remove_thread(self, thread_id: int) -> None:
+        with self._lock:
+            self._threads.discard(thread_id)
+            if not self._threads:
+                self._active.clear()
+
+    def write(self) -> None:
+        with self._lock:
+            samples = sorted(self._samples.items())
+        path = Path(str(self.path).format(pid=os.getpid()))
+        path.write_text("".join(f"{stack} {count}\n" for stack, count in samples))
+
+    def _run(self) -> None:
+        while True:
+            # sleep without sampling while no thread is inside a stage
+            self._active.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                threads = list(self._threads)
+            frames = sys._current_frames()
+            stacks = [self._collapse(frames[t]) for t in threads if t in frames]
+            with self._lock:
+                self._samples.update(stacks)
+
+    @staticmethod
+    def _collapse(frame: FrameType | None) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+
+class Instrumentation:
+    def __init__(
+        self,
+        exporters: list[MetricsExporter] | None = None,
+        trace_memory: bool = False,
+        profiler: SamplingProfiler | None = None,
+        flush_interval: float = 10.0,
+    ) -> None:
+        self.exporters = exporters or []
+        self.trace_memory = trace_memory
+        self.profiler = profiler
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flusher: threading.Thread | None = None
+        self._unflushed = threading.Event()
+        self._local = threading.local()
+        self._stages: dict[str, StageStats] = {}
+        self._caches: dict[str, CacheStats] = {}
+        self._sources: dict[str, Callable[[], dict[str, float]]] = {}
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.exporters or self.profiler is not None:
+            atexit.register(self.flush)
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    @classmethod
+    def from_environment(cls) -> "Instrumentation":
+        exporters: list[MetricsExporter] = []
+        for exporter in filter(None, os.environ.get("GNISTEN_METRICS", "").split(",")):
+            kind, _, path = exporter.strip().partition(":")
+            if kind == "log":
+                exporters.append(LogExporter())
+            elif kind == "json":
+                exporters.append(JsonFileExporter(Path(path)))
+            elif kind == "prometheus":
+                exporters.append(PrometheusExporter(Path(path)))
+            else:
+                raise ValueError(f"Unknown exporter in GNISTEN_METRICS: {exporter}")
+
+        profile_path = os.environ.get("GNISTEN_PROFILE")
+        return cls(
+            exporters=exporters,
+            trace_memory=os.environ.get("GNISTEN_TRACE_MEMORY") == "1",
+            profiler=SamplingProfiler(Path(profile_path)) if profile_path else None,
+            flush_interval=float(os.environ.get("GNISTEN_FLUSH_SECONDS", 10)),
+        )
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Stage]:
+        """Time the enclosed block and record what it processed under name."""
+        stack = self._stack()
+        current = Stage(name)
+        is_outermost = not stack
+        if is_outermost and self.profiler is not None:
+            self.profiler.add_thread(threading.get_ident())
+        if self.trace_memory:
+            memory_at_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+        stack.append(current)
+        started = time.perf_counter()
+        try:
+            yield current
+        finally:
+            elapsed = time.perf_counter() - started
+            stack.pop()
+            if self.trace_memory:
+                # the peak was reset by nested stages, which pass theirs on to us
+                peak = max(tracemalloc.get_traced_memory()[1], current._peak_traced)
+                current.peak_memory_bytes = peak - memory_at_start
+                if stack:
+                    stack[-1]._peak_traced = max(stack[-1]._peak_traced, peak)
+            self._record(current, elapsed)
+            if is_outermost:
+                if self.profiler is not None:
+                    self.profiler.remove_thread(threading.get_ident())
+                self._schedule_flush()
+
+    def instrumented(self, name: str) -> Callable[[F], F]:
+        """Decorator running the whole function as a stage."""
+
+        def decorator(function: F) -> F:
+            @wraps(function)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                with self.stage(name):
+                    return function(*args, **kwargs)
+
+            return wrapper  # type: ignore[return-value]
+
+        return decorator
+
+    def add_rows(self, rows: int) -> None:
+        """Add rows to the innermost running stage of this thread, if any."""
+        if stack := self._stack():
+            stack[-1].add_rows(rows)
+
+    def add_bytes(self, bytes_read: int) -> None:
+        """Add bytes to the innermost running stage of this thread, if any."""
+        if stack := self._stack():
+            stack[-1].add_bytes(bytes_read)
+
+    def record_cache(self, name: str, hit: bool) -> None:
+        with self._lock:
+            stats = self._caches.setdefault(name, CacheStats())
+            if hit:
+                stats.hits += 1
+            else:
+                stats.misses += 1
+
+    def register_source(
+        self, name: str, source: Callable[[], dict[str, float]]
+    ) -> None:
+        """Include the values returned by source in every snapshot."""
+        self._sources[name] = source
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "stages": {name: asdict(stats) for name, stats in self._stages.items()},
+                "caches": {
+                    name: {
+                        "hits": stats.hits,
+                        "misses": stats.misses,
+                        "hit_ratio": stats.hit_ratio,
+                    }
+                    for name, stats in self._caches.items()
+                },
+                "sources": {name: source() for name, source in self._sources.items()},
+            }
+
+    def flush(self) -> None:
+        """Pass the current snapshot to all exporters."""
+        if not self.exporters and self.profiler is None:
+            return
+        self._unflushed.clear()
+        snapshot = self.snapshot()
+        for exporter in self.exporters:
+            try:
+                exporter.export(snapshot)
+            except Exception:
+                # metrics must never break a request
+                logger.exception(f"Exporting metrics with {exporter} failed")
+        if self.profiler is not None:
+            try:
+                self.profiler.write()
+            except Exception:
+                logger.exception(f"Writing the profile to {self.profiler.path} failed")
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+            self._caches.clear()
+
+    def _after_fork(self) -> None:
+        """
+        The threads of the parent do not exist in a forked child, and its locks may
+        be held by them, so the child starts over with its own.
+        """
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._unflushed = threading.Event()
+        self._stages = {}
+        self._caches = {}
+        if self.profiler is not None:
+            self.profiler._reset()
+
+    def _schedule_flush(self) -> None:
+        """Have the exporters called by the background thread, see flush()."""
+        if not self.exporters and self.profiler is None:
+            return
+        self._unflushed.set()
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._run_flusher, name="MetricsFlusher", daemon=True
+                )
+                self._flusher.start()
+
+    def _run_flusher(self) -> None:
+        while True:
+            self._unflushed.wait()
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def _stack(self) -> list[Stage]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _record(self, stage: Stage, elapsed: float) -> None:
+        with self._lock:
+            stats = self._stages.setdefault(stage.name, StageStats())
+            stats.calls += 1
+            stats.total_seconds += elapsed
+            stats.max_seconds = max(stats.max_seconds, elapsed)
+            stats.rows += stage.rows
+            stats.bytes_read += stage.bytes_read
+            stats.peak_memory_bytes = max(
+                stats.peak_memory_bytes, stage.peak_memory_bytes
+            )
+
+
+instrumentation = Instrumentation.from_environment()
@@ -0,0 +1,184 @@
+"""
+What-if simulation of moving flexible load (EV charging, water heater) to the
+cheapest hours of every day.
+
+The consumption is handled as a (..., days x 24) matrix. A share of every day's
+consumption is flexible; it is taken out of every hour in proportion to the
+consumption, and filled into the cheapest allowed hours of the same day, up to the
+capacity left in each hour. All days, meters and flexibility levels are processed
+at once by sorting the hours of every day by price, so Backend passes the meters
+in batches to bound the memory.
+
+Only the cost with spot price changes, as Norgespris costs the same in every hour.
+"""
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class LoadShiftingResult:
+    """Costs per meter, before and after shifting each share of flexible load."""
+
+    meter_names: list[str]
+    shares: np.ndarray  # (levels,)
+    days: np.ndarray  # (meters,), number of complete days which were simulated
+    consumption: np.ndarray  # kWh, (meters,), the same before and after shifting
+    spot_cost_before: np.ndarray  # NOK, (meters,)
+    spot_cost_after: np.ndarray  # NOK, (meters x levels)
+
+    @property
+    def savings(self) -> np.ndarray:
+        """Spot cost saved by shifting, (meters x levels)."""
+        return self.spot_cost_before[:, None] - self.spot_cost_after
+
+    def norgespris_cost(self, fastpris_in_NOK: float) -> np.ndarray:
+        """Cost with Norgespris, (meters,), which shifting does not change."""
+        return self.consumption * fastpris_in_NOK
+
+    @classmethod
+    def concatenate(cls, results: list["LoadShiftingResult"]) -> "LoadShiftingResult":
+        """Combine the results of batches of meters, simulated with the same shares."""
+        return cls(
+            meter_names=[name for result in results for name in result.meter_names],
+            shares=results[0].shares,
+            days=np.concatenate([result.days for result in results]),
+            consumption=np.concatenate([result.consumption for result in results]),
+            spot_cost_before=np.concatenate(
+                [result.spot_cost_before for result in results]
+            ),
+            spot_cost_after=np.concatenate(
+                [result.spot_cost_after for result in results]
+            ),
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """Spot cost after shifting, one row per meter and one column per share."""
+        return pd.DataFrame(
+            self.spot_cost_after,
+            index=pd.Index(self.meter_names, name="meter"),
+            columns=pd.Index(self.shares, name="share"),
+        )
+
+
+def shift_load(
+    consumption: np.ndarray,
+    price: np.ndarray,
+    share: float | np.ndarray,
+    max_kwh_per_hour: float = np.inf,
+    allowed_hours: Sequence[int] = range(24),
+) -> np.ndarray:
+    """
+    Move a share of every day's consumption to the cheapest hours of the day.
+
+    Args:
+        consumption:
+            kWh as (..., days, 24), without NaN.
+        price:
+            Price as (days, 24), or anything which broadcasts to consumption.
+        share:
+            Share of the daily consumption which is flexible, between 0 and 1.
+            An array of shares must broadcast against consumption, e.g. shaped
+            (levels, 1, 1, 1) for consumption shaped (meters, days, 24).
+        max_kwh_per_hour:
+            Highest consumption in any hour the flexible load is moved to.
+        allowed_hours:
+            Hours of the day (0-23) the flexible load may be moved to.
+
+    Returns:
+        Consumption after shifting, same daily totals as before. Flexible load that
+        does not fit into the allowed hours stays in the hours it may not be moved
+        to, in proportion to their flexible load. Only if the allowed hours were
+        above max_kwh_per_hour on their own does some of it stay in them.
+    """
+    share = np.asarray(share, dtype=float)
+    flexible = consumption * share
+    base = consumption - flexible
+    flexible_per_day = flexible.sum(axis=-1, keepdims=True)
+
+    allowed = np.zeros(24, dtype=bool)
+    allowed[list(allowed_hours)] = True
+    capacity = np.where(allowed, np.clip(max_kwh_per_hour - base, 0, None), 0.0)
+    # no hour takes more than the whole flexible load, which also keeps it finite
+    capacity = np.minimum(capacity, flexible_per_day)
+
+    # fill the hours from the cheapest, each up to its capacity
+    price = np.broadcast_to(price, capacity.shape)
+    order = np.argsort(np.where(allowed, price, np.inf), axis=-1)
+    sorted_capacity = np.take_along_axis(capacity, order, axis=-1)
+    filled_before = np.cumsum(sorted_capacity, axis=-1) - sorted_capacity
+    sorted_moved = np.clip(flexible_per_day - filled_before, 0, sorted_capacity)
+    moved = np.zeros_like(sorted_moved)
+    np.put_along_axis(moved, order, sorted_moved, axis=-1)
+
+    # what did not fit stays where it was, first in the hours which are not allowed,
+    # so that it is not added on top of the allowed hours which were filled up
+    not_moved = np.clip(flexible_per_day - moved.sum(axis=-1, keepdims=True), 0, None)
+    flexible_elsewhere = np.where(allowed, 0.0, flexible)
+    flexible_in_allowed = flexible - flexible_elsewhere
+    elsewhere_per_day = flexible_elsewhere.sum(axis=-1, keepdims=True)
+    in_allowed_per_day = flexible_in_allowed.sum(axis=-1, keepdims=True)
+    stays_elsewhere = np.minimum(not_moved, elsewhere_per_day)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (
+            base
+            + moved
+            + flexible_elsewhere
+            * np.where(elsewhere_per_day > 0, stays_elsewhere / elsewhere_per_day, 0.0)
+            + flexible_in_allowed
+            * np.where(
+                in_allowed_per_day > 0,
+                (not_moved - stays_elsewhere) / in_allowed_per_day,
+                0.0,
+            )
+        )
+
+
+def simulate_load_shifting(
+    meter_names: list[str],
+    consumption: np.ndarray,
+    spot_price: np.ndarray,
+    shares: Sequence[float],
+    max_kwh_per_hour: float = np.inf,
+    allowed_hours: Sequence[int] = range(24),
+) -> LoadShiftingResult:
+    """
+    Args:
+        meter_names:
+            Name of the meter of every row in consumption.
+        consumption:
+            kWh as (meters x days x 24), see backend.timeseries.to_day_matrix.
+        spot_price:
+            Spot price with strømstøtte in NOK/kWh as (days x 24).
+        shares:
+            Shares of flexible load to simulate, see shift_load.
+
+    Only the days where the meter has all readings and all prices are available
+    are simulated for a meter, so that costs before and after are comparable.
+    """
+    complete_days = ~(
+        np.isnan(consumption).any(axis=2) | np.isnan(spot_price).any(axis=1)
+    )
+    # incomplete days cost nothing, before and after
+    consumption = np.where(complete_days[..., None], consumption, 0.0)
+    spot_price = np.nan_to_num(spot_price)
+    shares = np.asarray(shares, dtype=float)
+
+    shifted = shift_load(
+        consumption[None],
+        spot_price,
+        shares[:, None, None, None],
+        max_kwh_per_hour=max_kwh_per_hour,
+        allowed_hours=allowed_hours,
+    )
+    return LoadShiftingResult(
+        meter_names=list(meter_names),
+        shares=shares,
+        days=complete_days.sum(axis=1),
+        consumption=consumption.sum(axis=(1, 2)),
+        spot_cost_before=(consumption * spot_price).sum(axis=(1, 2)),
+        spot_cost_after=(shifted * spot_price).sum(axis=(2, 3)).T,
+    )
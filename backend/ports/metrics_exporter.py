@@ -0,0 +1,10 @@
+import abc
+from abc import ABC
+from typing import Any
+
+
+class MetricsExporter(ABC):
+    @abc.abstractmethod
+    def export(self, snapshot: dict[str, Any]) -> None:
+        """Export a snapshot as returned by Instrumentation.snapshot()"""
+        raise NotImplementedError
@@ -2,6 +2,8 @@ import abc
 from abc import ABC
 from datetime import datetime
 
+import pandas as pd
+
 
 class PriceFetcher(ABC):
     @abc.abstractmethod
@@ -12,3 +14,21 @@ class PriceFetcher(ABC):
         end: datetime,
     ) -> list[tuple[datetime, float]]:
         raise NotImplementedError
+
+    def get_price_series(
+        self,
+        price_area: str,
+        start: datetime,
+        end: datetime,
+    ) -> pd.Series:
+        """
+        The prices of get_price as a Series indexed by time in UTC. Adapters which
+        hold the prices as arrays can override this to avoid the pairs.
+        """
+        prices = self.get_price(price_area=price_area, start=start, end=end)
+        if not prices:
+            return pd.Series(index=pd.DatetimeIndex([], tz="UTC"), dtype=float)
+        times, values = zip(*prices)
+        return pd.Series(
+            values, index=pd.DatetimeIndex(times).tz_convert("UTC"), dtype=float
+        )
@@ -0,0 +1,222 @@
+"""
+Spot prices of all price areas as one (hours x areas) array on a shared hourly axis,
+so that questions across areas are single vectorized operations.
+"""
+
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from backend.ports.price_fetcher import PriceFetcher
+from backend.timeseries import window_starts
+
+PRICE_AREAS = ["NO1", "NO2", "NO3", "NO4", "NO5"]
+
+
+@dataclass
+class PriceMatrix:
+    """Prices in EUR/MWh as (hours x areas), NaN where an area has no price."""
+
+    axis: pd.DatetimeIndex
+    areas: list[str]
+    prices: np.ndarray
+
+    @property
+    def has_price(self) -> np.ndarray:
+        return ~np.isnan(self.prices)
+
+    def area(self, price_area: str) -> np.ndarray:
+        """Prices of one area, raises ValueError for an unknown area."""
+        return self.prices[:, self.areas.index(price_area)]
+
+    def window(self, start: datetime, end: datetime) -> "PriceMatrix":
+        """The hours from start to end (inclusive), without copying the prices."""
+        first = self.axis.searchsorted(pd.Timestamp(start), "left")
+        last = self.axis.searchsorted(pd.Timestamp(end), "right")
+        return PriceMatrix(
+            axis=self.axis[first:last],
+            areas=self.areas,
+            prices=self.prices[first:last],
+        )
+
+    def reindex(self, axis: pd.DatetimeIndex) -> np.ndarray:
+        """Prices for every hour of axis as (hours x areas), NaN outside the matrix."""
+        positions = self.axis.get_indexer(axis)
+        if not len(self.axis):
+            return np.full((len(axis), len(self.areas)), np.nan)
+        return np.where((positions >= 0)[:, None], self.prices[positions], np.nan)
+
+    def statistics(self, window: str = "month") -> pd.DataFrame:
+        """
+        Mean, minimum and maximum price and the number of hours with price, per
+        area and window ("day", "month", "year" or "all").
+        """
+        starts, start_times = window_starts(self.axis, window)
+        has_price = self.has_price
+        hours = np.add.reduceat(has_price.astype(int), starts, axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.add.reduceat(
+                np.where(has_price, self.prices, 0.0), starts, axis=0
+            ) / np.where(hours > 0, hours, np.nan)
+        statistics = {
+            "mean": mean,
+            "min": np.fmin.reduceat(self.prices, starts, axis=0),
+            "max": np.fmax.reduceat(self.prices, starts, axis=0),
+            "hours": hours,
+        }
+        return pd.concat(
+            {
+                name: pd.DataFrame(values, index=start_times, columns=self.areas)
+                for name, values in statistics.items()
+            },
+            axis=1,
+        ).swaplevel(axis=1)[self.areas]
+
+    def pairs(self, price_area: str) -> list[tuple[datetime, float]]:
+        """Prices of one area as returned by a PriceFetcher, without missing hours."""
+        prices = self.area(price_area)
+        has_price = ~np.isnan(prices)
+        return list(
+            zip(self.axis[has_price].to_pydatetime(), prices[has_price].tolist())
+        )
+
+    def with_prices(
+        self, price_area: str, prices: list[tuple[datetime, float]]
+    ) -> "PriceMatrix":
+        """
+        Matrix with the prices of an area set, and the axis extended to include them.
+        The prices of the new hours in the other areas are NaN.
+        """
+        if not prices:
+            return self
+        times, values = zip(*prices)
+        return self.with_series(
+            price_area,
+            pd.Series(values, index=pd.DatetimeIndex(times).tz_convert("UTC")),
+        )
+
+    def with_series(self, price_area: str, prices: pd.Series) -> "PriceMatrix":
+        """Like with_prices, for prices indexed by time."""
+        if prices.empty:
+            return self
+        times = pd.DatetimeIndex(prices.index).tz_convert("UTC")
+        bounds = times[[0, -1]] if not len(self.axis) else self.axis[[0, -1]]
+        axis = pd.date_range(
+            min(times.min(), bounds[0]), max(times.max(), bounds[1]), freq="h"
+        )
+
+        matrix = np.full((len(axis), len(self.areas)), np.nan)
+        if len(self.axis):
+            offset = axis.get_loc(self.axis[0])
+            matrix[offset : offset + len(self.axis)] = self.prices
+        positions = axis.get_indexer(times)
+        matrix[positions[positions >= 0], self.areas.index(price_area)] = (
+            prices.to_numpy(dtype=float)[positions >= 0]
+        )
+        return PriceMatrix(axis=axis, areas=self.areas, prices=matrix)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.prices.nbytes + self.axis.nbytes)
+
+
+class PriceMatrixStore:
+    """
+    Reads the prices of an area from a PriceFetcher the first time it is needed, and
+    keeps the prices of all areas in memory as one PriceMatrix.
+    """
+
+    def __init__(self, fetcher: PriceFetcher, areas: list[str] = PRICE_AREAS) -> None:
+        self.fetcher = fetcher
+        self.areas = list(areas)
+        self._lock = threading.Lock()
+        self._matrix: PriceMatrix
+        self._loaded: set[str]
+        self.invalidate()
+
+    def get(
+        self,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        areas: list[str] | None = None,
+    ) -> PriceMatrix:
+        """
+        Prices from start to end (inclusive), all prices if they are None. Only the
+        columns of areas (all if None) are guaranteed to be read, the others can be
+        NaN.
+        """
+        matrix = self._load(areas or self.areas)
+        if start is None and end is None or not len(matrix.axis):
+            return matrix
+        return matrix.window(
+            start if start is not None else matrix.axis[0],
+            end if end is not None else matrix.axis[-1],
+        )
+
+    def append(self, price_area: str, prices: list[tuple[datetime, float]]) -> None:
+        """Add new prices of an area, e.g. the next day from the day-ahead auction."""
+        with self._lock:
+            self._load_locked([price_area])
+            self._matrix = self._matrix.with_prices(price_area, prices)
+
+    def changed_prices(self) -> dict[str, list[tuple[datetime, float]]]:
+        """
+        Prices of the areas which have been read, which the fetcher returns now but
+        which are missing in or differ from the matrix, e.g. after a price file was
+        replaced with one with the next day. They are not added, see append.
+        """
+        with self._lock:
+            matrix = self._matrix
+            areas = [area for area in self.areas if area in self._loaded]
+        utc = ZoneInfo("UTC")
+        changed = {}
+        for area in areas:
+            prices = self.fetcher.get_price_series(
+                price_area=area,
+                start=datetime.min.replace(tzinfo=utc),
+                end=datetime.max.replace(tzinfo=utc),
+            )
+            current = matrix.reindex(pd.DatetimeIndex(prices.index))[
+                :, self.areas.index(area)
+            ]
+            values = prices.to_numpy(dtype=float)
+            is_changed = np.isnan(current) | (current != values)
+            if is_changed.any():
+                changed[area] = list(
+                    zip(
+                        prices.index[is_changed].to_pydatetime(),
+                        values[is_changed].tolist(),
+                    )
+                )
+        return changed
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._matrix = PriceMatrix(
+                axis=pd.DatetimeIndex([], tz="UTC"),
+                areas=self.areas,
+                prices=np.empty((0, len(self.areas))),
+            )
+            self._loaded = set()
+
+    def _load(self, areas: list[str]) -> PriceMatrix:
+        with self._lock:
+            self._load_locked(areas)
+            return self._matrix
+
+    def _load_locked(self, areas: list[str]) -> None:
+        utc = ZoneInfo("UTC")
+        for area in areas:
+            if area in self._loaded:
+                continue
+            prices = self.fetcher.get_price_series(
+                price_area=area,
+                start=datetime.min.replace(tzinfo=utc),
+                end=datetime.max.replace(tzinfo=utc),
+            )
+            self._matrix = self._matrix.with_series(area, prices)
+            self._loaded.add(area)
@@ -0,0 +1,223 @@
+"""
+Index of the load shapes of many meters, for finding households with similar
+consumption patterns.
+
+The load shape of a meter is its average consumption per hour of the day in every
+season, divided by its average consumption, so that households of different size
+but with the same habits are close. The shapes are L2-normalized, so the euclidean
+distance between them orders neighbours like the cosine similarity.
+
+Queries are answered by brute force, processed in blocks of meters so that the
+memory stays bounded for large fleets, or approximately by only searching the
+meters in the clusters (inverted lists, IVF) closest to the query.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+SEASONS = 4  # winter (Dec-Feb), spring, summer, autumn
+FEATURES = SEASONS * 24
+BLOCK_SIZE = 16384
+TRAINING_PER_LIST = 64  # sample size per cluster for k-means
+
+
+def load_shape_features(consumption: np.ndarray, axis: pd.DatetimeIndex) -> np.ndarray:
+    """
+    Args:
+        consumption:
+            Consumption in kWh as (meters x hours), NaN where there is no reading.
+        axis:
+            The hours of the columns in consumption.
+
+    Returns:
+        Normalized load shapes as (meters x FEATURES). A season without readings
+        gets the average shape of the other seasons, and a meter without readings
+        a row of NaN.
+    """
+    season = (axis.month.to_numpy() % 12) // 3
+    group = season * 24 + axis.hour.to_numpy()
+    one_hot = np.zeros((len(axis), FEATURES))
+    one_hot[np.arange(len(axis)), group] = 1.0
+
+    has_reading = ~np.isnan(consumption)
+    sums = np.where(has_reading, consumption, 0.0) @ one_hot
+    counts = has_reading.astype(float) @ one_hot
+    with np.errstate(invalid="ignore", divide="ignore"):
+        profile = (sums / counts).reshape(-1, SEASONS, 24)
+        # mean over the seasons with readings, NaN if there are none
+        has_season = ~np.isnan(profile)
+        daily = np.where(has_season, profile, 0.0).sum(
+            axis=1, keepdims=True
+        ) / has_season.sum(axis=1, keepdims=True)
+        profile = np.where(np.isnan(profile), daily, profile).reshape(-1, FEATURES)
+        profile /= profile.mean(axis=1, keepdims=True)
+        return profile / np.linalg.norm(profile, axis=1, keepdims=True)
+
+
+def nearest(
+    queries: np.ndarray, vectors: np.ndarray, k: int, block_size: int = BLOCK_SIZE
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Exact k nearest vectors of every query by euclidean distance, computing the
+    distances to block_size vectors at a time.
+
+    Returns:
+        Index in vectors and distance as (queries x k), closest first.
+    """
+    k = min(k, len(vectors))
+    query_norms = (queries**2).sum(axis=1)[:, None]
+    best_index = np.empty((len(queries), 0), dtype=int)
+    best_distance = np.empty((len(queries), 0))
+
+    for start in range(0, len(vectors), block_size):
+        block = vectors[start : start + block_size]
+        distance = query_norms - 2 * queries @ block.T + (block**2).sum(axis=1)
+        index = np.concatenate(
+            [
+                best_index,
+                np.broadcast_to(start + np.arange(len(block)), distance.shape),
+            ],
+            axis=1,
+        )
+        distance = np.concatenate([best_distance, distance], axis=1)
+        keep = np.argpartition(distance, k - 1, axis=1)[:, :k]
+        best_index = np.take_along_axis(index, keep, axis=1)
+        best_distance = np.take_along_axis(distance, keep, axis=1)
+
+    order = np.argsort(best_distance, axis=1)
+    return (
+        np.take_along_axis(best_index, order, axis=1),
+        np.sqrt(np.maximum(np.take_along_axis(best_distance, order, axis=1), 0.0)),
+    )
+
+
+@dataclass
+class LoadShapeIndex:
+    """Load shapes of meters, see load_shape_features, with an optional IVF index."""
+
+    meter_names: list[str]
+    features: np.ndarray  # (meters x FEATURES)
+    centroids: np.ndarray | None = None  # (lists x FEATURES)
+    list_offsets: np.ndarray | None = None  # start of every list in list_members
+    list_members: np.ndarray | None = None  # meters sorted by list
+
+    @classmethod
+    def build(
+        cls,
+        meter_names: list[str],
+        features: np.ndarray,
+        n_lists: int = 0,
+        iterations: int = 10,
+        seed: int = 0,
+    ) -> "LoadShapeIndex":
+        """
+        Args:
+            meter_names, features:
+                Name and load shape of every meter. Meters without load shape (NaN)
+                are left out.
+            n_lists:
+                Number of clusters of the approximate index, 0 for brute force only.
+                Around the square root of the number of meters is a good choice.
+            iterations:
+                Iterations of k-means when clustering.
+        """
+        has_shape = ~np.isnan(features).any(axis=1)
+        index = cls(
+            meter_names=[name for name, ok in zip(meter_names, has_shape) if ok],
+            features=np.ascontiguousarray(features[has_shape]),
+        )
+        if n_lists > 0 and len(index.features):
+            index._cluster(min(n_lists, len(index.features)), iterations, seed)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.meter_names)
+
+    def query(
+        self, features: np.ndarray, k: int = 5, n_probe: int | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The k most similar meters of every load shape in features (queries x
+        FEATURES), or of a single load shape.
+
+        Args:
+            n_probe:
+                Only search the meters in the n_probe clusters closest to the query.
+                Requires an index built with n_lists > 0. None searches all meters.
+
+        Returns:
+            Index in meter_names and distance as (queries x k), most similar first.
+            If fewer than k meters are searched, the rest is -1 and inf.
+        """
+        queries = np.atleast_2d(features).astype(float)
+        if n_probe is None:
+            return nearest(queries, self.features, k)
+        if self.centroids is None:
+            raise ValueError("The index was built without clusters (n_lists=0)")
+
+        indices = np.full((len(queries), k), -1)
+        distances = np.full((len(queries), k), np.inf)
+        lists, _ = nearest(queries, self.centroids, n_probe)
+        for i, (query, probed) in enumerate(zip(queries, lists)):
+            candidates = np.concatenate(
+                [
+                    self.list_members[self.list_offsets[j] : self.list_offsets[j + 1]]
+                    for j in probed
+                ]
+            )
+            found, distance = nearest(query[None], self.features[candidates], k)
+            indices[i, : found.shape[1]] = candidates[found[0]]
+            distances[i, : found.shape[1]] = distance[0]
+        return indices, distances
+
+    def similar(
+        self, meter_name: str, k: int = 5, n_probe: int | None = None
+    ) -> list[tuple[str, float]]:
+        """The k meters most similar to an indexed meter, not including itself."""
+        features = self.features[self.meter_names.index(meter_name)]
+        indices, distances = self.query(features, k + 1, n_probe)
+        return [
+            (self.meter_names[i], float(distance))
+            for i, distance in zip(indices[0], distances[0])
+            if i >= 0 and self.meter_names[i] != meter_name
+        ][:k]
+
+    def _cluster(self, n_lists: int, iterations: int, seed: int) -> None:
+        """
+        k-means on a sample of TRAINING_PER_LIST meters per cluster, then every
+        meter is put in the list of its closest centroid.
+        """
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(self.features), TRAINING_PER_LIST * n_lists)
+        training = self.features[
+            rng.choice(len(self.features), sample_size, replace=False)
+        ]
+        centroids = training[:n_lists]
+        for _ in range(iterations):
+            assignment = _closest(training, centroids)
+            counts = np.bincount(assignment, minlength=n_lists)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, training)
+            # empty clusters keep their centroid
+            centroids = np.where(
+                counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centroids
+            )
+
+        assignment = _closest(self.features, centroids)
+        self.centroids = centroids
+        self.list_members = np.argsort(assignment, kind="stable")
+        self.list_offsets = np.searchsorted(
+            assignment[self.list_members], np.arange(n_lists + 1)
+        )
+
+
+def _closest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the closest centroid of every vector, block_size vectors at a time."""
+    return np.concatenate(
+        [
+            nearest(vectors[start : start + BLOCK_SIZE], centroids, 1)[0][:, 0]
+            for start in range(0, len(vectors), BLOCK_SIZE)
+        ]
+    )
@@ -0,0 +1,124 @@
+"""
+Single-flight execution of identical concurrent computations.
+
+When several callers ask for the same key while a computation for it is still
+running, only the first caller computes. The others wait and share its result (or
+its exception). Nothing is cached after the computation finishes, that is left to
+the caller (e.g. st.cache_data).
+"""
+
+import asyncio
+import threading
+import time
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class SingleFlightStats:
+    """Counters describing how much work the single-flight layer saved."""
+
+    calls: int = 0  # computations which were actually executed
+    shared: int = 0  # callers which joined an in-flight computation
+    errors: int = 0  # computations which raised
+    wait_seconds: float = 0.0  # total time the joining callers spent waiting
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    @property
+    def share_ratio(self) -> float:
+        total = self.calls + self.shared
+        return self.shared / total if total else 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "calls": self.calls,
+            "shared": self.shared,
+            "errors": self.errors,
+            "wait_seconds": self.wait_seconds,
+            "share_ratio": self.share_ratio,
+        }
+
+    def _add(self, **increments: float) -> None:
+        with self._lock:
+            for name, increment in increments.items():
+                setattr(self, name, getattr(self, name) + increment)
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Thread-safe single-flight, e.g. for the Streamlit script threads."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._in_flight: dict[Hashable, _Call] = {}
+        self.stats = SingleFlightStats()
+
+    def do(self, key: Hashable, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Return fn(*args, **kwargs), shared with concurrent callers using key."""
+        with self._lock:
+            call = self._in_flight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._in_flight[key] = _Call()
+
+        if not is_leader:
+            started = time.perf_counter()
+            call.done.wait()
+            self.stats._add(shared=1, wait_seconds=time.perf_counter() - started)
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        self.stats._add(calls=1)
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as error:
+            call.error = error
+            self.stats._add(errors=1)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+        return call.result
+
+
+class AsyncSingleFlight:
+    """Single-flight for coroutines running on one event loop."""
+
+    def __init__(self) -> None:
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+        self.stats = SingleFlightStats()
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await fn(), shared with concurrent callers using key."""
+        future = self._in_flight.get(key)
+        if future is None:
+            self.stats._add(calls=1)
+            future = asyncio.ensure_future(fn())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done: self._on_done(key, done))
+            # shield, so one client disconnecting does not cancel the others
+            return await asyncio.shield(future)
+
+        started = time.perf_counter()
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self.stats._add(shared=1, wait_seconds=time.perf_counter() - started)
+
+    def _on_done(self, key: Hashable, future: asyncio.Future) -> None:
+        self._in_flight.pop(key, None)
+        if not future.cancelled() and future.exception() is not None:
+            self.stats._add(errors=1)
@@ -0,0 +1,122 @@
+"""
+Helpers for putting meter readings and prices on a common hourly time axis, as
+numpy arrays, so that calculations over many meters and hours can be vectorized.
+
+Like in Backend, the times in the Elhub exports and the price files are read as UTC.
+"""
+
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+CONSUMPTION_COLUMN = "KWH 60 Forbruk"
+TIME_COLUMN = "Fra"
+
+
+def hourly_axis(start: datetime, end: datetime) -> pd.DatetimeIndex:
+    """All hours from start to end (inclusive), in UTC."""
+    return pd.date_range(
+        pd.Timestamp(start).tz_convert("UTC"),
+        pd.Timestamp(end).tz_convert("UTC"),
+        freq="h",
+    )
+
+
+def hourly_consumption(
+    consumption_data: pd.DataFrame,
+    consumption_column: str = CONSUMPTION_COLUMN,
+    time_column: str = TIME_COLUMN,
+) -> pd.Series:
+    """
+    Consumption in kWh indexed by the hour in UTC, sorted by time.
+
+    When the clocks are turned back, the exports have two readings starting at the
+    same (local) hour. Since the times are read as UTC, only one of them can be
+    kept. This is the last one in consumption_data, like the spot cost has always
+    done. All calculations must get their consumption from here, so that they use
+    the same reading.
+    """
+    times = pd.DatetimeIndex(consumption_data[time_column].to_numpy())
+    series = pd.Series(
+        consumption_data[consumption_column].to_numpy(dtype=float),
+        index=times.tz_localize(ZoneInfo("UTC")),
+    )
+    return series[~series.index.duplicated(keep="last")].sort_index()
+
+
+def consumption_array(hourly: pd.Series, axis: pd.DatetimeIndex) -> np.ndarray:
+    """
+    Consumption for every hour of axis, NaN where there is no reading.
+
+    Args:
+        hourly:
+            Consumption indexed by the hour in UTC, see hourly_consumption.
+    """
+    return hourly.reindex(axis).to_numpy(dtype=float)
+
+
+def consumption_matrix(
+    meter_hourly: dict[str, pd.Series], axis: pd.DatetimeIndex
+) -> np.ndarray:
+    """Consumption of all meters as a (meters x hours) array, see consumption_array."""
+    if not meter_hourly:
+        return np.empty((0, len(axis)))
+    return np.stack(
+        [consumption_array(hourly, axis) for hourly in meter_hourly.values()]
+    )
+
+
+def price_array(
+    prices: list[tuple[datetime, float]], axis: pd.DatetimeIndex
+) -> np.ndarray:
+    """Prices as returned by a PriceFetcher for every hour of axis, NaN if missing."""
+    if not prices:
+        return np.full(len(axis), np.nan)
+    times, values = zip(*prices)
+    series = pd.Series(values, index=pd.DatetimeIndex(times).tz_convert("UTC"))
+    series = series[~series.index.duplicated(keep="last")]
+    return series.reindex(axis).to_numpy(dtype=float)
+
+
+def window_starts(
+    axis: pd.DatetimeIndex, window: str
+) -> tuple[np.ndarray, pd.DatetimeIndex]:
+    """
+    Split axis into consecutive windows.
+
+    Args:
+        axis:
+            Hourly time axis.
+        window:
+            "day", "month", "year" or "all".
+
+    Returns:
+        Index in axis of the first hour of every window (as used by np.add.reduceat),
+        and the start time of every window.
+    """
+    if window == "all":
+        return np.array([0]), axis[:1]
+    periods = {"day": "D", "month": "M", "year": "Y"}
+    codes = axis.tz_convert(None).to_period(periods[window]).asi8
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    return starts, axis[starts]
+
+
+def to_day_matrix(
+    values: np.ndarray, axis: pd.DatetimeIndex
+) -> tuple[np.ndarray, pd.DatetimeIndex]:
+    """
+    Reshape values on an hourly axis, shaped (..., hours), to (..., days, 24). Hours
+    before the start and after the end of axis are filled with NaN.
+
+    Returns:
+        The reshaped values and the start of every day.
+    """
+    leading_hours = axis[0].hour
+    trailing_hours = -(leading_hours + len(axis)) % 24
+    padding = [(0, 0)] * (values.ndim - 1) + [(leading_hours, trailing_hours)]
+    padded = np.pad(values.astype(float), padding, constant_values=np.nan)
+    days = pd.date_range(axis[0].floor("D"), periods=padded.shape[-1] // 24, freq="D")
+    return padded.reshape(*values.shape[:-1], -1, 24), days
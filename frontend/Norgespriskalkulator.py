@@ -1,15 +1,19 @@
+"""
+Entry point of the Streamlit app, which is executed again on every interaction.
+
+To serve the first page quickly, only streamlit and the light-weight frontend
+modules are imported at the top. pandas, the backend and plotly (through make_plot)
+are imported on first use, and everything which only has to be loaded once per
+process is kept with st.cache_resource.
+"""
+
 import os
-from datetime import datetime
-from typing import Dict, List
-from zoneinfo import ZoneInfo
+from datetime import datetime, time
+from typing import TYPE_CHECKING, Dict
 
-import pandas as pd
 import streamlit as st
-from dotenv import load_dotenv
-from PIL import Image
 
 try:
-    from backend.app import Backend
     from frontend.graphics.controls import controls
     from frontend.graphics.elements import colored_box
     from frontend.graphics.make_plot import make_plot
@@ -18,64 +22,50 @@ except ModuleNotFoundError:
     msg = "Could not import code, did you run pip install -e . ?"
     raise ModuleNotFoundError(msg)
 
-load_dotenv("CONFIG.env")
-logo = Image.open("assets/logo-green-nobackground.png")
-icon = Image.open("assets/ikon-gold-nobackground.png")
-
+if TYPE_CHECKING:
+    from PIL.Image import Image
 
-st.set_page_config(page_title="Norgespriskalkulator", page_icon=icon, layout="wide")
+    from backend.app import Backend
+    from backend.cost_comparison import CostComparison
 
 
-app = Backend()
+@st.cache_resource
+def load_assets() -> Dict[str, "Image"]:
+    from dotenv import load_dotenv
+    from PIL import Image
 
+    load_dotenv("CONFIG.env")
+    return {
+        "logo": Image.open("assets/logo-green-nobackground.png"),
+        "icon": Image.open("assets/ikon-gold-nobackground.png"),
+    }
 
-@st.cache_data
-def henter_og_beregner_data(
-    user: str, fastpris_in_nok: float, price_area: str
-) -> Dict[str, pd.DataFrame]:
-    """
-    Aggregates specified value columns in a time-indexed DataFrame.
 
-    :param data: DataFrame with a DatetimeIndex.
-    :param value_columns: List of column names to aggregate.
-    :return: Dictionary with aggregated DataFrames for each level.
+@st.cache_resource
+def get_backend() -> "Backend":
+    from backend.app import Backend
 
-    NB. The function name is shown in the app so i've given it a norwegian name
-    """
-    spot_cost = app.get_spotpris_cost_per_hour(
-        start=datetime(2022, 6, 1, hour=0, tzinfo=ZoneInfo("UTC")),
-        end=datetime(2025, 3, 1, hour=23, tzinfo=ZoneInfo("UTC")),
-        meter_name=user,
-        price_area=price_area,
-    )
+    return Backend()
 
-    norgespris_cost = app.get_fastpris_cost_per_hour(
-        fastpris_in_NOK=fastpris_in_nok,
-        start=datetime(2022, 6, 1, hour=0, tzinfo=ZoneInfo("UTC")),
-        end=datetime(2025, 3, 1, hour=23, tzinfo=ZoneInfo("UTC")),
-        meter_name=user,
-    )
 
-    data = pd.concat([spot_cost, norgespris_cost], axis=1)
-    data.columns = ["Spotpris", "Norgespris"]
-    data["Spotpris"] = data["Spotpris"].astype(float)
-    data["Norgespris"] = data["Norgespris"].astype(float)
+assets = load_assets()
+logo = assets["logo"]
+icon = assets["icon"]
 
-    # removing index because of interactive date-picker, can be readded later
-    data.index = data.index.tz_convert(None)
 
-    value_columns = ["Spotpris", "Norgespris"]
+st.set_page_config(page_title="Norgespriskalkulator", page_icon=icon, layout="wide")
 
-    if not isinstance(data.index, pd.DatetimeIndex):
-        raise ValueError("Data index must be a DatetimeIndex.")
 
-    return {
-        "original": data,
-        "hour": data[value_columns].resample("H").sum(),
-        "day": data[value_columns].resample("D").sum(),
-        "month": data[value_columns].resample("M").sum(),
-        "year": data[value_columns].resample("Y").sum(),
-    }
+def henter_og_beregner_data(user: str, price_area: str) -> "CostComparison":
+    """
+    Fetches the spot cost and consumption of the user. The cost with any Norgespris
+    is derived from it by scaling the consumption, and it is cached by the backend,
+    so changing the Norgespris does not recompute anything.
+    """
+    with st.spinner("Henter og beregner data ..."):
+        return get_backend().get_parametric_comparison(
+            meter_name=user, price_area=price_area
+        )
 
 
 # with st.sidebar:
@@ -115,47 +105,35 @@ st.write(f"Beregner for {user_mapping[config.select_user]['bio']}")
 
 hour_tab, day_tab, month_tab, year_tab = st.tabs(["Time", "Dag", "Måned", "År"])
 
-data = henter_og_beregner_data(
+fastpris_in_nok = config.assumed_fixed_price / 100
+comparison = henter_og_beregner_data(
     user_mapping[config.select_user]["timeseries"],
-    fastpris_in_nok=config.assumed_fixed_price / 100,
     price_area=user_mapping[config.select_user]["price_area"],
 )
+data = comparison.with_fastpris(fastpris_in_nok)
 
-with hour_tab:
-    hour_plot = make_plot(
-        data=data["hour"].loc[config.time_window[0] : config.time_window[1]]
-    )
-    with st.expander("Se som tabell"):
-        st.dataframe(data["hour"].loc[config.time_window[0] : config.time_window[1]])
-with day_tab:
-    day_plot = make_plot(
-        data=data["day"].loc[config.time_window[0] : config.time_window[1]]
-    )
-    with st.expander("Se som tabell"):
-        st.dataframe(data["day"].loc[config.time_window[0] : config.time_window[1]])
-with month_tab:
-    month_plot = make_plot(
-        data=data["month"].loc[config.time_window[0] : config.time_window[1]]
-    )
-    with st.expander("Se som tabell"):
-        st.dataframe(data["month"].loc[config.time_window[0] : config.time_window[1]])
-with year_tab:
-    year_plot = make_plot(
-        data=data["year"].loc[config.time_window[0] : config.time_window[1]]
-    )
-    with st.expander("Se som tabell"):
-        st.dataframe(data["year"].loc[config.time_window[0] : config.time_window[1]])
-
-
-cost_with_spotprice = (
-    data["original"]
-    .loc[config.time_window[0] : config.time_window[1]]["Spotpris"]
-    .sum()
+# the index is naive UTC, and slicing it with dates is deprecated in pandas
+window = slice(
+    datetime.combine(config.time_window[0], time.min),
+    datetime.combine(config.time_window[1], time.min),
 )
-cost_with_norgesprice = (
-    data["original"]
-    .loc[config.time_window[0] : config.time_window[1]]["Norgespris"]
-    .sum()
+
+for tab, level in zip(
+    [hour_tab, day_tab, month_tab, year_tab], ["hour", "day", "month", "year"]
+):
+    with tab:
+        data_in_window = data[level].loc[window]
+        make_plot(data=data_in_window, key=f"plot_{level}")
+        with st.expander("Se som tabell"):
+            st.dataframe(data_in_window)
+
+
+totals = comparison.totals(fastpris_in_nok, start=window.start, end=window.stop)
+cost_with_spotprice = totals["Spotpris"]
+cost_with_norgesprice = totals["Norgespris"]
+# None if there is no consumption in the window
+break_even_price = (
+    totals["Spotpris"] / totals["Forbruk"] if totals["Forbruk"] > 0 else None
 )
 
 
@@ -185,6 +163,12 @@ if config.input_is_set is True:
             unsafe_allow_html=True,
         )
 
+    if break_even_price is not None:
+        st.write(
+            f"Norgespris lønner seg for deg i valgt periode hvis den er under "
+            f"{break_even_price * 100:.1f} øre/kWh"
+        )
+
 
 @st.dialog(title="Informasjon om Norgespriskalkulator", width="large")
 def vote(item):
@@ -0,0 +1,210 @@
+"""
+Headless benchmark of the latency of user interactions in the calculator.
+
+The app is driven with Streamlit's testing API (AppTest) through a scripted scenario
+of interactions. Every interaction is one rerun of the script, from the controls
+through henter_og_beregner_data and the plots of all four tabs to the totals.
+Switching between the tabs happens in the browser without a rerun, so it is not
+an interaction of its own, but rendering all tabs is part of every rerun.
+
+The cold start is measured in fresh processes, so that nothing is cached. The
+latency percentiles and the peak memory (RSS) are printed and can be written to
+a JSON file, and compared against a baseline to fail on regressions:
+
+    python -m frontend.benchmark --output results/ui_benchmark.json
+    python -m frontend.benchmark --baseline results/ui_benchmark.json
+
+The app needs PATH_TO_NORWAY_PRICES, like when it is served.
+"""
+
+import argparse
+import datetime
+import json
+import resource
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from streamlit.testing.v1 import AppTest
+
+ROOT = Path(__file__).parents[1]
+APP = ROOT / "frontend" / "Norgespriskalkulator.py"
+TIMEOUT_SECONDS = 120
+PERCENTILES = [50, 90, 99]
+
+# a regression is slower or larger than the baseline by both the relative and the
+# absolute tolerance, so that noise on short interactions is not reported
+RELATIVE_TOLERANCE = 0.5
+SECONDS_TOLERANCE = 0.05
+MEMORY_TOLERANCE_MB = 50
+
+
+def _select_user(index: int) -> Callable[[AppTest], Any]:
+    return lambda app: app.sidebar.selectbox[0].set_value(
+        ["Christine", "Jan Erik"][index % 2]
+    )
+
+
+def _set_fixed_price(index: int) -> Callable[[AppTest], Any]:
+    return lambda app: app.sidebar.number_input[0].set_value(30 + 10 * (index % 5))
+
+
+def _move_date_window(index: int) -> Callable[[AppTest], Any]:
+    start = datetime.date(2022, 6, 1) + datetime.timedelta(days=30 * (index % 12))
+    return lambda app: app.sidebar.date_input[0].set_value(
+        (start, start + datetime.timedelta(days=180))
+    )
+
+
+# name and the change of the controls for the i-th repetition
+INTERACTIONS: dict[str, Callable[[int], Callable[[AppTest], Any]]] = {
+    "rerun": lambda index: lambda app: None,
+    "change_fixed_price": _set_fixed_price,
+    "move_date_window": _move_date_window,
+    "switch_user": _select_user,
+}
+
+
+def max_rss_mb() -> float:
+    """Peak resident memory of this process, ru_maxrss is in kB on Linux."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def summarize(seconds: list[float]) -> dict[str, float]:
+    return {
+        "runs": len(seconds),
+        **{
+            f"p{percentile}": float(np.percentile(seconds, percentile))
+            for percentile in PERCENTILES
+        },
+        "max": max(seconds),
+    }
+
+
+def cold_start() -> dict[str, float]:
+    """Time of the first run of the app, in this process."""
+    started = time.perf_counter()
+    app = AppTest.from_file(str(APP), default_timeout=TIMEOUT_SECONDS).run()
+    seconds = time.perf_counter() - started
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    return {"seconds": seconds, "max_rss_mb": max_rss_mb()}
+
+
+def run_benchmark(repeat: int = 10, cold_samples: int = 3) -> dict[str, Any]:
+    """
+    Args:
+        repeat:
+            How often every interaction is run after the app has started.
+        cold_samples:
+            Number of fresh processes in which the cold start is measured.
+
+    Returns:
+        Latency percentiles in seconds per interaction, and peak memory in MB.
+    """
+    cold = [
+        json.loads(
+            subprocess.run(
+                [sys.executable, "-m", "frontend.benchmark", "--cold-start-only"],
+                cwd=ROOT,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.splitlines()[-1]
+        )
+        for _ in range(cold_samples)
+    ]
+
+    app = AppTest.from_file(str(APP), default_timeout=TIMEOUT_SECONDS).run()
+    seconds: dict[str, list[float]] = {name: [] for name in INTERACTIONS}
+    for index in range(repeat):
+        for name, interaction in INTERACTIONS.items():
+            interaction(index)(app)
+            started = time.perf_counter()
+            app.run()
+            seconds[name].append(time.perf_counter() - started)
+            if app.exception:
+                raise RuntimeError(f"{name}: {app.exception[0].message}")
+
+    report: dict[str, Any] = {
+        "interactions": {name: summarize(values) for name, values in seconds.items()},
+        "max_rss_mb": max_rss_mb(),
+    }
+    if cold:
+        report["interactions"]["cold_start"] = summarize([c["seconds"] for c in cold])
+        report["cold_start_max_rss_mb"] = max(c["max_rss_mb"] for c in cold)
+    return report
+
+
+def find_regressions(
+    report: dict[str, Any],
+    baseline: dict[str, Any],
+    relative_tolerance: float = RELATIVE_TOLERANCE,
+) -> list[str]:
+    """Interactions whose median, and memory which is worse than the baseline."""
+    regressions = []
+    for name, stats in report["interactions"].items():
+        if name not in baseline["interactions"]:
+            continue
+        limit = baseline["interactions"][name]["p50"]
+        limit = max(limit * (1 + relative_tolerance), limit + SECONDS_TOLERANCE)
+        if stats["p50"] > limit:
+            regressions.append(
+                f"{name}: median {stats['p50']:.3f} s, limit {limit:.3f} s"
+            )
+    for key in ["max_rss_mb", "cold_start_max_rss_mb"]:
+        if key not in report or key not in baseline:
+            continue
+        limit = baseline[key] * (1 + relative_tolerance) + MEMORY_TOLERANCE_MB
+        if report[key] > limit:
+            regressions.append(f"{key}: {report[key]:.0f} MB, limit {limit:.0f} MB")
+    return regressions
+
+
+def format_report(report: dict[str, Any]) -> str:
+    lines = [f"{'interaction':<20}{'runs':>6}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}"]
+    for name, stats in report["interactions"].items():
+        lines.append(
+            f"{name:<20}{stats['runs']:>6}"
+            + "".join(f"{stats[key]:>8.3f}s" for key in ["p50", "p90", "p99", "max"])
+        )
+    lines.append(f"peak memory: {report['max_rss_mb']:.0f} MB")
+    if "cold_start_max_rss_mb" in report:
+        lines.append(
+            f"peak memory, cold start: {report['cold_start_max_rss_mb']:.0f} MB"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--cold-samples", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    parser.add_argument("--baseline", type=Path, help="fail if slower than this")
+    parser.add_argument("--tolerance", type=float, default=RELATIVE_TOLERANCE)
+    parser.add_argument(
+        "--cold-start-only", action="store_true", help=argparse.SUPPRESS
+    )
+    args = parser.parse_args()
+
+    if args.cold_start_only:
+        print(json.dumps(cold_start()))
+        sys.exit()
+
+    report = run_benchmark(repeat=args.repeat, cold_samples=args.cold_samples)
+    print(format_report(report))
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=4))
+    if args.baseline:
+        regressions = find_regressions(
+            report, json.loads(args.baseline.read_text()), args.tolerance
+        )
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        sys.exit(1 if regressions else 0)
@@ -1,16 +1,23 @@
-from functools import lru_cache
+from typing import TYPE_CHECKING
 
-import pandas as pd
-import plotly.express as px
 import streamlit as st
 
-from utils.NorgesPlotter import NorgesPlotter
+from backend.instrumentation import instrumentation
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 # @st.cache_resource
+@instrumentation.instrumented("make_plot")
 def make_plot(
-    data: pd.DataFrame = None,
+    data: "pd.DataFrame" = None,
+    key: str | None = None,
 ) -> None:
+    # plotly is slow to import, so it is first imported when the first plot is made
+    from utils.NorgesPlotter import NorgesPlotter
+
+    instrumentation.add_rows(len(data))
     plotter = NorgesPlotter(data)
     plotter.add_line(
         x_col="index",
@@ -32,5 +39,8 @@ def make_plot(
     )
     plotter.shade_between_lines()
     st.plotly_chart(
-        plotter.show_plot(streamlit_mode=True), config=({"displayModeBar": False})
+        plotter.show_plot(streamlit_mode=True),
+        config=({"displayModeBar": False}),
+        # the plots of two tabs are identical if the window has no data
+        key=key,
     )
@@ -0,0 +1,26 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+
+def write_price_file(folder: Path, price_area: str) -> None:
+    """Write a price file in the same format as PriceDayAheadNOx_2022_2025.csv"""
+    timestamps = pd.date_range("2023-01-01", "2023-01-31 23:00", freq="h")
+    lines = ["timestamp,id,instance_time,scenario,ingestion_time,value,custom_data"]
+    for i, timestamp in enumerate(timestamps):
+        value = f"{100 + i % 24},00"
+        lines.append(
+            f"{timestamp:%Y-%m-%d %H:%M:%S}.0000000,baz.{price_area.lower()},,,"
+            f'2023-01-01 11:05:57.5926405,"{value}","{{}}"'
+        )
+    (folder / f"PriceDayAhead{price_area}_2022_2025.csv").write_text("\n".join(lines))
+
+
+@pytest.fixture
+def path_to_norway_prices(tmp_path, monkeypatch) -> Path:
+    """Folder with prices for all areas in January 2023, set as PATH_TO_NORWAY_PRICES"""
+    for price_area in ["NO1", "NO2", "NO3", "NO4", "NO5"]:
+        write_price_file(tmp_path, price_area)
+    monkeypatch.setenv("PATH_TO_NORWAY_PRICES", str(tmp_path))
+    return tmp_path
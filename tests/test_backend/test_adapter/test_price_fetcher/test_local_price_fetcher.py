@@ -4,8 +4,11 @@ from datetime import datetime
 from pathlib import Path
 from zoneinfo import ZoneInfo
 
+import pandas as pd
+
 from backend.adapter.price_fetcher.local_spot_price_fetcher import (
     LocalSpotPriceFetcher,
+    read_price_series,
 )
 
 
@@ -24,6 +27,43 @@ class TestLocalSpotPriceFetcher:
             (datetime(2025, 4, 16, hour=21, tzinfo=ZoneInfo("UTC")), 42.00),
         ]
 
+    def test_revised_prices_and_multiline_fields(self, tmp_path) -> None:
+        file = tmp_path / "PriceDayAheadNO1_2022_2025.csv"
+        file.write_text(
+            "timestamp,id,instance_time,scenario,ingestion_time,value,custom_data\n"
+            '2023-01-01 01:00:00.0000000,baz.no1,,,2023-01-01 11:00:00,"2,5","{}"\n'
+            '2023-01-01 00:00:00.0000000,baz.no1,,,2023-01-02 11:00:00,"1,25",'
+            '"{""note"": ""revised,\nlate""}"\n'
+            '2023-01-01 00:00:00.0000000,baz.no1,,,2023-01-01 11:00:00,"1000,5","{}"\n'
+        )
+
+        prices = read_price_series(file)
+
+        pd.testing.assert_series_equal(
+            prices,
+            pd.Series(
+                [1.25, 2.5],
+                index=pd.DatetimeIndex(
+                    ["2023-01-01 00:00", "2023-01-01 01:00"], tz="UTC"
+                ).as_unit("us"),
+            ),
+        )
+
+    def test_price_file_is_parsed_once(self, tmp_path, monkeypatch) -> None:
+        (tmp_path / "PriceDayAheadNO1_2022_2025.csv").write_text(
+            "timestamp,id,instance_time,scenario,ingestion_time,value,custom_data\n"
+            '2023-01-01 00:00:00.0000000,baz.no1,,,2023-01-01 11:00:00,"1,5","{}"\n'
+        )
+        fetcher = LocalSpotPriceFetcher(path_to_norway_data=tmp_path)
+        start = datetime(2023, 1, 1, tzinfo=ZoneInfo("UTC"))
+        fetcher.get_price_series("NO1", start, start)
+        monkeypatch.setattr(
+            "backend.adapter.price_fetcher.local_spot_price_fetcher.read_price_series",
+            lambda file: pd.Series(dtype=float),
+        )
+
+        assert fetcher.get_price("NO1", start, start) == [(start, 1.5)]
+
     def test_with_original_data(self) -> None:
         try:
             path = os.environ["PATH_TO_NORWAY_PRICES"]
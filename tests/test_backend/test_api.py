@@ -0,0 +1,90 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import api
+
+
+@pytest.fixture
+def client(path_to_norway_prices, monkeypatch):
+    monkeypatch.setattr(api, "_worker_backend", None)
+    with ThreadPoolExecutor(max_workers=2, initializer=api._init_worker) as executor:
+        with TestClient(api.create_app(executor=executor)) as test_client:
+            yield test_client
+
+
+def test_meters(client):
+    assert client.get("/meters").json() == ["Trydal_1", "Trydal_2", "christine"]
+
+
+def test_comparison_as_json(client):
+    response = client.get(
+        "/comparison",
+        params={"meter": "Trydal_1", "price_area": "NO1", "fastpris": 0.4},
+    )
+
+    assert response.status_code == 200
+    content = response.json()
+    assert content["columns"] == ["Spotpris", "Norgespris"]
+    assert len(content["data"]) == 31 * 24
+
+
+def test_comparison_window_includes_all_hours_of_the_end_day(client):
+    response = client.get(
+        "/comparison",
+        params={
+            "meter": "Trydal_1",
+            "price_area": "NO1",
+            "start": "2023-01-30",
+            "end": "2023-01-31",
+        },
+    )
+
+    content = response.json()
+    assert len(content["data"]) == 2 * 24
+    assert pd.Timestamp(content["index"][-1]) == pd.Timestamp("2023-01-31 23:00")
+
+
+def test_aggregates_as_arrow(client):
+    response = client.get(
+        "/aggregates/day",
+        params={
+            "meter": "Trydal_1",
+            "price_area": "NO1",
+            "start": "2023-01-10",
+            "end": "2023-01-19",
+            "format": "arrow",
+        },
+    )
+
+    assert response.headers["content-type"] == api.ARROW_MEDIA_TYPE
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column_names == ["time", "Spotpris", "Norgespris"]
+    assert table.num_rows == 10
+
+
+def test_totals_match_comparison(client):
+    params = {"meter": "christine", "price_area": "NO1", "fastpris": 0.5}
+    totals = client.get("/totals", params=params).json()
+    hourly = pd.DataFrame(**client.get("/comparison", params=params).json())
+
+    assert totals["Spotpris"] == pytest.approx(hourly["Spotpris"].sum())
+    assert totals["Norgespris"] == pytest.approx(hourly["Norgespris"].sum())
+
+
+def test_unknown_meter_and_price_area(client):
+    params = {"meter": "../backend", "price_area": "NO1"}
+    assert client.get("/totals", params=params).status_code == 404
+
+    params = {"meter": "Trydal_1", "price_area": "NO42"}
+    assert client.get("/totals", params=params).status_code == 422
+
+
+def test_stats(client):
+    params = {"meter": "Trydal_1", "price_area": "NO1"}
+    client.get("/totals", params=params)
+
+    assert client.get("/stats").json()["calls"] == 1
@@ -0,0 +1,229 @@
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.app import Backend
+from backend.consumption_store import ConsumptionStore, MeterConsumption
+from utils.ReadElhubExport import read_elhub_file
+
+UTC = ZoneInfo("UTC")
+START = datetime(2023, 1, 1, tzinfo=UTC)
+END = datetime(2023, 2, 28, hour=23, tzinfo=UTC)
+
+# the price files of path_to_norway_prices end on January 31
+NEXT_DAY = [(datetime(2023, 2, 1, hour, tzinfo=UTC), 50.0 + hour) for hour in range(24)]
+
+
+def readings(start: datetime, hours: int, kwh: float = 1.0) -> pd.DataFrame:
+    fra = pd.date_range(start.replace(tzinfo=None), periods=hours, freq="h")
+    return pd.DataFrame(
+        {
+            "Fra": fra,
+            "Til": fra + timedelta(hours=1),
+            "KWH 60 Forbruk": kwh,
+            "Kvalitet": "Avlest",
+        }
+    )
+
+
+def write_export(path: Path, readings: pd.DataFrame) -> None:
+    """Write readings in the format of an Elhub export"""
+    readings.to_csv(
+        path, sep=";", index=False, date_format="%d.%m.%Y %H:%M", decimal=","
+    )
+
+
+def test_meter_consumption_append_keeps_existing_hours() -> None:
+    consumption = MeterConsumption.from_readings(readings(START, 48))
+
+    extended, added = consumption.append(readings(START + timedelta(days=1), 48, 2.0))
+
+    assert len(added) == 24
+    assert (added == 2.0).all()
+    assert len(extended.hourly) == len(extended.readings) == 72
+    assert extended.hourly.iloc[:48].eq(1.0).all()
+    assert len(consumption.hourly) == 48
+
+
+def test_append_prices_extends_cached_comparison(
+    path_to_norway_prices, monkeypatch
+) -> None:
+    fresh = Backend()
+    fresh.append_prices("NO1", NEXT_DAY)
+    expected = fresh.get_parametric_comparison("Trydal_1", "NO1", START, END)
+
+    backend = Backend()
+    comparison = backend.get_parametric_comparison("Trydal_1", "NO1", START, END)
+    assert comparison.hourly.index[-1] == datetime(2023, 1, 31, 23)
+
+    def recompute(*args, **kwargs):
+        raise AssertionError("the comparison should be extended, not recomputed")
+
+    monkeypatch.setattr(backend, "_compute_parametric_comparison", recompute)
+    backend.append_prices("NO1", NEXT_DAY)
+    extended = backend.get_parametric_comparison("Trydal_1", "NO1", START, END)
+
+    assert len(extended.hourly) == len(comparison.hourly) + 24
+    pd.testing.assert_frame_equal(extended.hourly, expected.hourly, check_freq=False)
+    pd.testing.assert_frame_equal(
+        extended.rollups["month"], expected.rollups["month"], check_freq=False
+    )
+    assert extended.totals(0.5) == pytest.approx(expected.totals(0.5))
+
+
+def test_append_prices_of_other_area_keeps_comparison(path_to_norway_prices) -> None:
+    backend = Backend()
+    comparison = backend.get_parametric_comparison("Trydal_1", "NO1", START, END)
+
+    backend.append_prices("NO2", NEXT_DAY)
+
+    assert backend.get_parametric_comparison("Trydal_1", "NO1", START, END) is (
+        comparison
+    )
+
+
+def test_corrected_price_invalidates_comparison(path_to_norway_prices) -> None:
+    backend = Backend()
+    backend.get_parametric_comparison("Trydal_1", "NO1", START, END)
+
+    backend.append_prices("NO1", [(datetime(2023, 1, 10, tzinfo=UTC), 1000.0)])
+
+    assert len(backend.cost_comparisons) == 0
+    comparison = backend.get_parametric_comparison("Trydal_1", "NO1", START, END)
+    assert comparison.hourly.loc[datetime(2023, 1, 10), "Spotpris"] > 0
+
+
+def test_append_readings_extends_cached_comparison(path_to_norway_prices) -> None:
+    # the readings of Trydal_1 end on 2025-04-22
+    start = datetime(2025, 4, 22, tzinfo=UTC)
+    end = datetime(2025, 4, 23, hour=23, tzinfo=UTC)
+    backend = Backend()
+    backend.append_prices(
+        "NO1", [(start + timedelta(hours=hour), 50.0) for hour in range(48)]
+    )
+    comparison = backend.get_parametric_comparison("Trydal_1", "NO1", start, end)
+    assert len(comparison.hourly) == 24
+
+    backend.append_readings("Trydal_1", readings(start + timedelta(days=1), 24, 2.0))
+    extended = backend.get_parametric_comparison("Trydal_1", "NO1", start, end)
+
+    assert len(extended.hourly) == 48
+    assert extended.hourly["Forbruk"].iloc[24:].eq(2.0).all()
+    np.testing.assert_allclose(extended.hourly["Spotpris"].iloc[24:], 2.0 * 0.55)
+
+
+def test_append_readings_before_last_hour_invalidates(path_to_norway_prices) -> None:
+    backend = Backend()
+    backend.get_parametric_comparison("Trydal_1", "NO1", START, END)
+
+    # hours before the first reading of the meter, which is on 2022-03-18
+    backend.append_readings("Trydal_1", readings(datetime(2022, 1, 1), 24, 2.0))
+
+    assert len(backend.cost_comparisons) == 1
+    backend.append_readings("Trydal_1", readings(datetime(2023, 1, 1), 24, 2.0))
+    assert len(backend.cost_comparisons) == 1
+
+
+def test_append_readings_after_the_meter_was_read_again(
+    path_to_norway_prices, tmp_path_factory
+) -> None:
+    meter = tmp_path_factory.mktemp("data") / "meter"
+    meter.mkdir()
+    write_export(meter / "january.csv", readings(START, 22 * 24))
+    start = datetime(2023, 1, 20, tzinfo=UTC)
+    end = datetime(2023, 1, 25, hour=23, tzinfo=UTC)
+    backend = Backend()
+    backend.consumption_store = ConsumptionStore(base_path=str(meter.parent))
+    comparison = backend.get_parametric_comparison("meter", "NO1", start, end)
+    assert comparison.hourly.index[-1] == datetime(2023, 1, 22, 23)
+
+    # the meter is evicted, and the new export is put in the meter folder
+    backend.consumption_store.invalidate("meter")
+    write_export(meter / "new.csv", readings(datetime(2023, 1, 23), 24, 2.0))
+    backend.append_readings("meter", read_elhub_file(meter / "new.csv"))
+
+    fresh = Backend()
+    fresh.consumption_store = ConsumptionStore(base_path=str(meter.parent))
+    expected = fresh.get_parametric_comparison("meter", "NO1", start, end)
+    extended = backend.get_parametric_comparison("meter", "NO1", start, end)
+    assert extended.hourly.index[-1] == datetime(2023, 1, 23, 23)
+    pd.testing.assert_frame_equal(extended.hourly, expected.hourly, check_freq=False)
+
+
+def test_append_while_comparison_is_computed(path_to_norway_prices) -> None:
+    fresh = Backend()
+    fresh.append_prices("NO1", NEXT_DAY)
+    expected = fresh.get_parametric_comparison("Trydal_1", "NO1", START, END)
+
+    backend = Backend()
+    computed, release = threading.Event(), threading.Event()
+    compute = backend._compute_parametric_comparison
+
+    def slow_compute(*args):
+        # computed from the prices before the append, finishes after it
+        comparison = compute(*args)
+        computed.set()
+        release.wait(timeout=10)
+        return comparison
+
+    backend._compute_parametric_comparison = slow_compute
+    thread = threading.Thread(
+        target=backend.get_parametric_comparison, args=("Trydal_1", "NO1", START, END)
+    )
+    thread.start()
+    assert computed.wait(timeout=10)
+    backend.append_prices("NO1", NEXT_DAY)
+    release.set()
+    thread.join()
+
+    backend._compute_parametric_comparison = compute
+    comparison = backend.get_parametric_comparison("Trydal_1", "NO1", START, END)
+    assert comparison.hourly.index[-1] == datetime(2023, 2, 1, 23)
+    pd.testing.assert_frame_equal(comparison.hourly, expected.hourly, check_freq=False)
+
+
+def test_replaced_price_file_is_picked_up(path_to_norway_prices) -> None:
+    backend = Backend()
+    backend.get_parametric_comparison("Trydal_1", "NO1", START, END)
+    assert backend.refresh() == {}
+
+    # the price file is replaced by one which also has the next day
+    file = path_to_norway_prices / "PriceDayAheadNO1_2022_2025.csv"
+    new_file = file.rename(file.with_name("PriceDayAheadNO1_2022_2026.csv"))
+    with open(new_file, "a") as price_file:
+        for time, price in NEXT_DAY:
+            price_file.write(
+                f"\n{time:%Y-%m-%d %H:%M:%S}.0000000,baz.no1,,,"
+                f'2023-01-31 11:05:57.5926405,"{price:.0f},00","{{}}"'
+            )
+    backend.refresh_interval = 0
+    comparison = backend.get_parametric_comparison("Trydal_1", "NO1", START, END)
+
+    fresh = Backend()
+    expected = fresh.get_parametric_comparison("Trydal_1", "NO1", START, END)
+    assert comparison.hourly.index[-1] == datetime(2023, 2, 1, 23)
+    pd.testing.assert_frame_equal(comparison.hourly, expected.hourly, check_freq=False)
+    assert backend.refresh() == {}
+
+
+def test_new_export_is_picked_up(path_to_norway_prices, tmp_path_factory) -> None:
+    meter = tmp_path_factory.mktemp("data") / "meter"
+    meter.mkdir()
+    write_export(meter / "january.csv", readings(START, 22 * 24))
+    backend = Backend()
+    backend.consumption_store = ConsumptionStore(base_path=str(meter.parent))
+    comparison = backend.get_parametric_comparison("meter", "NO1", START, END)
+    assert comparison.hourly.index[-1] == datetime(2023, 1, 22, 23)
+
+    write_export(meter / "new.csv", readings(datetime(2023, 1, 23), 24, 2.0))
+
+    assert backend.refresh() == {"meter": 24}
+    assert backend.refresh() == {}
+    extended = backend.get_parametric_comparison("meter", "NO1", START, END)
+    assert extended.hourly.index[-1] == datetime(2023, 1, 23, 23)
+    assert extended.hourly["Forbruk"].iloc[-24:].eq(2.0).all()
@@ -0,0 +1,82 @@
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend import archive
+from backend.archive import read_archive, read_archive_index, write_archive
+from backend.consumption_store import ConsumptionStore
+
+
+@pytest.fixture
+def readings() -> pd.Series:
+    index = pd.date_range("2023-01-01", "2023-12-31 23:00", freq="h", tz="UTC")
+    rng = np.random.default_rng(7)
+    return pd.Series(np.round(rng.random(len(index)) * 4, 3), index=index, name="kWh")
+
+
+def test_round_trip_fixed_point(tmp_path, readings) -> None:
+    path = write_archive(tmp_path / "meter.gnts", readings, metadata={"unit": "kWh"})
+
+    result = read_archive(path)
+
+    pd.testing.assert_series_equal(result, readings, check_freq=False)
+    index, chunks = read_archive_index(path)
+    assert index["metadata"] == {"unit": "kWh"}
+    assert sum(chunk.count for chunk in chunks) == len(readings)
+    assert chunks[0].max == readings.iloc[: chunks[0].count].max()
+
+
+def test_round_trip_floats_gaps_and_nan(tmp_path) -> None:
+    index = pd.DatetimeIndex(
+        ["2023-01-01 00:00", "2023-01-01 01:00", "2023-01-01 05:00", "2023-03-26 02:00"]
+    )
+    series = pd.Series([np.pi, np.nan, -1e-9, 1e300], index=index)
+
+    result = read_archive(write_archive(tmp_path / "floats.gnts", series, chunk_size=3))
+
+    pd.testing.assert_series_equal(
+        result, series.tz_localize("UTC"), check_index_type=False
+    )
+
+
+def test_window_only_decodes_overlapping_chunks(
+    tmp_path, readings, monkeypatch
+) -> None:
+    path = write_archive(tmp_path / "meter.gnts", readings, chunk_size=24 * 7)
+    decoded = []
+    decode_chunk = archive._decode_chunk
+    monkeypatch.setattr(
+        archive,
+        "_decode_chunk",
+        lambda payload, count: decoded.append(count) or decode_chunk(payload, count),
+    )
+
+    result = read_archive(path, datetime(2023, 3, 1), datetime(2023, 3, 10, 23))
+
+    pd.testing.assert_series_equal(
+        result, readings.loc["2023-03-01":"2023-03-10 23:00"], check_freq=False
+    )
+    assert len(decoded) == 2
+
+
+def test_meter_archive_is_much_smaller_than_csv(tmp_path) -> None:
+    hourly = ConsumptionStore().get("Trydal_1").hourly
+    csv_files = (Path(__file__).parents[2] / "data" / "Trydal_1").glob("*.csv")
+    csv_bytes = sum(file.stat().st_size for file in csv_files)
+
+    path = write_archive(tmp_path / "Trydal_1.gnts", hourly)
+
+    assert path.stat().st_size * 10 < csv_bytes
+    pd.testing.assert_series_equal(
+        read_archive(path), hourly, check_names=False, check_freq=False
+    )
+
+
+def test_not_an_archive(tmp_path) -> None:
+    (tmp_path / "file.gnts").write_bytes(b"timestamp,value\n")
+
+    with pytest.raises(ValueError):
+        read_archive(tmp_path / "file.gnts")
@@ -0,0 +1,60 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pytest
+
+from backend.app import Backend
+from backend.break_even import solve_break_even
+from backend.timeseries import hourly_axis
+
+
+def test_solve_break_even() -> None:
+    axis = hourly_axis(
+        datetime(2023, 1, 31, tzinfo=ZoneInfo("UTC")),
+        datetime(2023, 2, 1, hour=23, tzinfo=ZoneInfo("UTC")),
+    )
+    consumption = np.ones((2, len(axis)))
+    consumption[1, :24] = 2
+    consumption[1, 0] = np.nan
+    spot_price = np.full(len(axis), 0.5)
+    spot_price[24:] = 1.0
+    spot_price[30] = np.nan
+
+    result = solve_break_even(["a", "b"], consumption, spot_price, axis)
+
+    assert list(result.window_starts.month) == [1, 2]
+    np.testing.assert_allclose(result.consumption, [[24, 23], [46, 23]])
+    np.testing.assert_allclose(result.break_even_price, [[0.5, 1.0], [0.5, 1.0]])
+    savings = result.savings(np.array([0.4, 0.5, 0.6]))
+    assert savings.shape == (2, 2, 3)
+    np.testing.assert_allclose(savings[0, 0], [2.4, 0.0, -2.4])
+
+
+def test_windows_without_consumption() -> None:
+    axis = hourly_axis(
+        datetime(2023, 1, 1, tzinfo=ZoneInfo("UTC")),
+        datetime(2023, 1, 2, hour=23, tzinfo=ZoneInfo("UTC")),
+    )
+    consumption = np.full((1, len(axis)), np.nan)
+
+    result = solve_break_even(["a"], consumption, np.ones(len(axis)), axis, "day")
+
+    assert np.isnan(result.break_even_price).all()
+    assert len(result.to_frame()) == 2
+
+
+def test_break_even_price_gives_equal_cost(path_to_norway_prices) -> None:
+    start = datetime(2023, 1, 1, tzinfo=ZoneInfo("UTC"))
+    end = datetime(2023, 1, 31, hour=23, tzinfo=ZoneInfo("UTC"))
+    app = Backend()
+
+    result = app.get_break_even_prices(
+        meter_names=["Trydal_1", "christine"], start=start, end=end, window="all"
+    )
+
+    for meter_name, price in zip(result.meter_names, result.break_even_price[:, 0]):
+        costs = app.get_cost_comparison(
+            fastpris_in_NOK=price, meter_name=meter_name, start=start, end=end
+        )["original"].sum()
+        assert costs["Norgespris"] == pytest.approx(costs["Spotpris"])
@@ -0,0 +1,32 @@
+from backend.cache import MemoryBoundedCache
+
+
+class TestMemoryBoundedCache:
+    def test_least_recently_used_is_evicted(self) -> None:
+        cache = MemoryBoundedCache("test", max_bytes=10, sizeof=len)
+        cache.put("a", "aaaa")
+        cache.put("b", "bbbb")
+        cache.get("a")
+        cache.put("c", "cccc")
+
+        assert "a" in cache
+        assert "b" not in cache
+        assert cache.nbytes == 8
+
+    def test_value_larger_than_budget_is_not_cached(self) -> None:
+        cache = MemoryBoundedCache("test", max_bytes=3, sizeof=len)
+        cache.put("a", "aaaa")
+
+        assert cache.get("a") is None
+        assert cache.nbytes == 0
+
+    def test_invalidate(self) -> None:
+        cache = MemoryBoundedCache("test", max_bytes=100, sizeof=len)
+        for key in [("Trydal_1", "NO1"), ("Trydal_1", "NO2"), ("christine", "NO1")]:
+            cache.put(key, "value")
+
+        removed = cache.invalidate(lambda key: key[0] == "Trydal_1")
+
+        assert removed == 2
+        assert len(cache) == 1
+        assert cache.nbytes == 5
@@ -0,0 +1,135 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.app import NOK_PER_EUR, Backend, calculate_stroemstoette
+from backend.consumption_store import ConsumptionStore
+from backend.cost_comparison import CostComparison
+
+
+@pytest.fixture
+def comparison() -> CostComparison:
+    index = pd.date_range("2023-01-01", "2023-03-31 23:00", freq="h", tz="UTC")
+    rng = np.random.default_rng(42)
+    consumption = pd.Series(rng.random(len(index)) * 3, index=index)
+    spot_cost = consumption * 0.8
+    # hours without price are not in the spot cost
+    return CostComparison.from_hourly(spot_cost.iloc[:-24], consumption)
+
+
+def test_with_fastpris_scales_consumption(comparison) -> None:
+    data = comparison.with_fastpris(0.5)
+
+    assert list(data) == ["original", "hour", "day", "month", "year"]
+    assert len(data["original"]) == (31 + 28 + 30) * 24
+    assert list(data["month"].columns) == ["Spotpris", "Norgespris"]
+    np.testing.assert_allclose(
+        data["month"]["Norgespris"], comparison.rollups["month"]["Forbruk"] * 0.5
+    )
+    np.testing.assert_allclose(
+        data["month"]["Spotpris"], data["month"]["Norgespris"] * 1.6
+    )
+
+
+def test_totals_match_summed_hours(comparison) -> None:
+    start, end = datetime(2023, 2, 1), datetime(2023, 2, 10)
+    hours = comparison.with_fastpris(0.4)["original"].loc[start:end]
+
+    totals = comparison.totals(0.4, start=start, end=end)
+
+    assert totals["Spotpris"] == pytest.approx(hours["Spotpris"].sum())
+    assert totals["Norgespris"] == pytest.approx(hours["Norgespris"].sum())
+    assert comparison.totals(0.4, start=end, end=start)["Forbruk"] == 0
+    assert comparison.totals(0.4)["Forbruk"] == pytest.approx(
+        comparison.hourly["Forbruk"].sum()
+    )
+
+
+def test_changing_fastpris_does_not_recompute(path_to_norway_prices) -> None:
+    app = Backend()
+    kwargs = dict(
+        meter_name="Trydal_1",
+        start=datetime(2023, 1, 1, tzinfo=ZoneInfo("UTC")),
+        end=datetime(2023, 1, 31, hour=23, tzinfo=ZoneInfo("UTC")),
+    )
+
+    low = app.get_cost_comparison(fastpris_in_NOK=0.4, **kwargs)
+    high = app.get_cost_comparison(fastpris_in_NOK=0.8, **kwargs)
+
+    assert len(app.cost_comparisons) == 1
+    pd.testing.assert_series_equal(low["day"]["Spotpris"], high["day"]["Spotpris"])
+    pd.testing.assert_series_equal(
+        low["day"]["Norgespris"] * 2, high["day"]["Norgespris"]
+    )
+
+
+def test_fastpris_cost_per_hour_is_scaled_consumption(path_to_norway_prices) -> None:
+    app = Backend()
+    start = datetime(2023, 1, 1, tzinfo=ZoneInfo("UTC"))
+    end = datetime(2023, 1, 1, hour=23, tzinfo=ZoneInfo("UTC"))
+
+    cost = app.get_fastpris_cost_per_hour(start, end, fastpris_in_NOK=2)
+    consumption = app.consumption_store.get("Trydal_1").series(start, end)
+
+    assert len(cost) == 24
+    pd.testing.assert_series_equal(cost, consumption * 2)
+
+
+def test_repeated_hour_uses_the_same_reading_everywhere(
+    path_to_norway_prices, tmp_path_factory
+) -> None:
+    # an export where the clocks are turned back, read as UTC the hour repeats
+    meter = tmp_path_factory.mktemp("data") / "meter"
+    meter.mkdir()
+    (meter / "export.csv").write_text(
+        "Fra;Til;KWH 60 Forbruk;Kvalitet\n"
+        "15.01.2023 01:00;15.01.2023 02:00;1,00;Avlest\n"
+        "15.01.2023 02:00;15.01.2023 03:00;3,00;Avlest\n"
+        "15.01.2023 02:00;15.01.2023 02:00;2,00;Avlest\n"
+        "15.01.2023 03:00;15.01.2023 04:00;4,00;Avlest\n"
+    )
+    app = Backend()
+    app.consumption_store = ConsumptionStore(base_path=str(meter.parent))
+    start = datetime(2023, 1, 15, tzinfo=ZoneInfo("UTC"))
+    end = datetime(2023, 1, 15, hour=23, tzinfo=ZoneInfo("UTC"))
+
+    comparison = app.get_parametric_comparison("meter", "NO1", start, end)
+    by_area = app.compare_price_areas("meter", start, end)
+
+    # the last of the two readings, priced at the 02:00 price of 102 EUR/MWh
+    repeated = comparison.hourly.loc[datetime(2023, 1, 15, 2)]
+    assert repeated["Forbruk"] == 2.0
+    assert repeated["Spotpris"] == pytest.approx(
+        2.0 * calculate_stroemstoette(102 * NOK_PER_EUR / 1e3)
+    )
+    assert by_area.loc["NO1", "Forbruk"] == comparison.hourly["Forbruk"].sum() == 7
+    assert by_area.loc["NO1", "Spotpris"] == pytest.approx(
+        comparison.hourly["Spotpris"].sum()
+    )
+
+
+def test_append_matches_computing_everything() -> None:
+    index = pd.date_range("2023-01-30", "2023-02-02 23:00", freq="h", tz="UTC")
+    consumption = pd.Series(np.arange(len(index), dtype=float), index=index)
+    spot_cost = consumption * 0.5
+    split = 2 * 24 + 5
+
+    appended = CostComparison.from_hourly(
+        spot_cost.iloc[:split], consumption.iloc[:split]
+    ).append(spot_cost.iloc[split:], consumption.iloc[split:])
+    expected = CostComparison.from_hourly(spot_cost, consumption)
+
+    pd.testing.assert_frame_equal(appended.hourly, expected.hourly)
+    for level, rollup in expected.rollups.items():
+        pd.testing.assert_frame_equal(appended.rollups[level], rollup, check_freq=False)
+    np.testing.assert_allclose(appended.cumulative, expected.cumulative)
+
+
+def test_append_only_after_last_hour(comparison) -> None:
+    hour = comparison.hourly.index[-1:].tz_localize("UTC")
+
+    with pytest.raises(ValueError):
+        comparison.append(pd.Series([1.0], index=hour), pd.Series([1.0], index=hour))
@@ -0,0 +1,76 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from backend.app import COST_COLUMNS
+from backend.export import (
+    ROWS_PER_GROUP,
+    cost_comparison_path,
+    export_cost_comparison,
+    read_cost_comparison,
+    read_metadata,
+)
+
+
+@pytest.fixture
+def comparison() -> dict[str, pd.DataFrame]:
+    index = pd.date_range("2023-01-01", "2023-12-31 23:00", freq="h")
+    rng = np.random.default_rng(42)
+    data = pd.DataFrame(rng.random((len(index), 2)), index=index, columns=COST_COLUMNS)
+    return {
+        "original": data,
+        "day": data.resample("D").sum(),
+        "month": data.resample("ME").sum(),
+    }
+
+
+@pytest.mark.parametrize("export_format", ["parquet", "arrow"])
+def test_round_trip(tmp_path, comparison, export_format) -> None:
+    path = cost_comparison_path(tmp_path, "Trydal_1", "NO2", 0.4)
+    files = export_cost_comparison(
+        comparison, path, export_format=export_format, metadata={"meter": "Trydal_1"}
+    )
+
+    data = read_cost_comparison(path)
+
+    assert len(files) == 3
+    assert list(data) == ["original", "day", "month"]
+    for level, frame in comparison.items():
+        pd.testing.assert_frame_equal(
+            data[level], frame, check_names=False, check_freq=False
+        )
+    assert read_metadata(files[0]) == {"level": "original", "meter": "Trydal_1"}
+
+
+@pytest.mark.parametrize("export_format", ["parquet", "arrow"])
+def test_read_window(tmp_path, comparison, export_format) -> None:
+    export_cost_comparison(comparison, tmp_path, export_format=export_format)
+
+    data = read_cost_comparison(
+        tmp_path, start=datetime(2023, 3, 1), end=datetime(2023, 3, 31, 23)
+    )
+
+    assert len(data["original"]) == 31 * 24
+    assert len(data["day"]) == 31
+    assert data["original"]["Spotpris"].sum() == pytest.approx(
+        comparison["original"].loc["2023-03", "Spotpris"].sum()
+    )
+
+
+def test_parquet_has_time_statistics_per_row_group(tmp_path, comparison) -> None:
+    export_cost_comparison(comparison, tmp_path)
+
+    metadata = pq.ParquetFile(tmp_path / "original.parquet").metadata
+
+    assert metadata.num_row_groups == -(-365 * 24 // ROWS_PER_GROUP)
+    statistics = metadata.row_group(1).column(0).statistics
+    assert statistics.has_min_max
+    assert statistics.min == datetime(2023, 1, 1) + pd.Timedelta(hours=ROWS_PER_GROUP)
+
+
+def test_read_missing_comparison(tmp_path) -> None:
+    with pytest.raises(ValueError):
+        read_cost_comparison(tmp_path)
@@ -0,0 +1,131 @@
+import json
+from datetime import datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.app import Backend
+from backend.grid_tariff import (
+    GridTariff,
+    available_tariffs,
+    calculate_grid_tariff,
+    load_tariff,
+    monthly_peaks,
+)
+from backend.timeseries import hourly_axis
+
+
+@pytest.fixture
+def tariff() -> GridTariff:
+    return GridTariff(
+        name="test",
+        energy_price=np.r_[np.full(6, 0.1), np.full(18, 0.2)],
+        step_limits=np.array([2, 5, np.inf]),
+        step_prices=np.array([100.0, 200.0, 300.0]),
+    )
+
+
+def test_monthly_peaks_averages_three_highest_days() -> None:
+    days = pd.date_range("2023-01-30", "2023-02-03", freq="D", tz="UTC")
+    daily_peaks = np.array([[1.0, 4.0, 9.0, np.nan, 3.0], [2.0, 2.0, 1.0, 5.0, 6.0]])
+
+    peaks, months = monthly_peaks(daily_peaks, days)
+
+    assert list(months) == [
+        pd.Timestamp("2023-01-01", tz="UTC"),
+        pd.Timestamp("2023-02-01", tz="UTC"),
+    ]
+    # fewer than three days in the month are averaged over the days there are
+    np.testing.assert_allclose(peaks, [[2.5, 6.0], [2.0, 4.0]])
+
+
+def test_monthly_peaks_is_nan_without_readings() -> None:
+    days = pd.date_range("2023-01-01", periods=31, freq="D", tz="UTC")
+
+    peaks, _ = monthly_peaks(np.full((1, 31), np.nan), days)
+
+    assert np.isnan(peaks).all()
+
+
+def test_calculate_grid_tariff(tariff: GridTariff) -> None:
+    axis = hourly_axis(
+        datetime(2023, 1, 1, tzinfo=ZoneInfo("UTC")),
+        datetime(2023, 2, 28, 23, tzinfo=ZoneInfo("UTC")),
+    )
+    consumption = np.ones((3, len(axis)))
+    consumption[0, [10, 34, 58, 82]] = [3, 4, 5, 6]  # peaks on four days in January
+    consumption[1, 0] = 20
+    consumption[2, : 31 * 24] = np.nan
+
+    result = calculate_grid_tariff(["a", "b", "c"], consumption, axis, tariff)
+
+    np.testing.assert_allclose(result.peak_kw[0], [5, 1])
+    np.testing.assert_allclose(result.peak_kw[1], [(20 + 1 + 1) / 3, 1])
+    assert np.isnan(result.peak_kw[2, 0])
+    np.testing.assert_array_equal(result.capacity_step, [[1, 0], [2, 0], [-1, 0]])
+    np.testing.assert_allclose(result.capacity_cost, [[200, 100], [300, 100], [0, 100]])
+
+    january_energy = 31 * (6 * 0.1 + 18 * 0.2)
+    february_energy = 28 * (6 * 0.1 + 18 * 0.2)
+    assert result.energy_cost[0, 0] == pytest.approx(
+        january_energy + (2 + 3 + 4 + 5) * 0.2
+    )
+    assert result.energy_cost[1, 0] == pytest.approx(january_energy + 19 * 0.1)
+    np.testing.assert_allclose(result.energy_cost[:, 1], february_energy)
+    assert result.energy_cost[2, 0] == 0
+
+    frame = result.to_frame()
+    assert len(frame) == 6
+    assert frame["total_cost"].sum() == pytest.approx(result.total_cost.sum())
+
+
+def test_load_tariff(tmp_path: Path) -> None:
+    table = {
+        "name": "Test",
+        "energy_price": [0.3] * 24,
+        "capacity_steps": [
+            {"up_to_kw": 2, "monthly_price": 100},
+            {"up_to_kw": None, "monthly_price": 500},
+        ],
+    }
+    (tmp_path / "test.json").write_text(json.dumps(table))
+
+    tariff = load_tariff("test", tariff_dir=tmp_path)
+
+    assert tariff.name == "Test"
+    np.testing.assert_array_equal(tariff.step_limits, [2, np.inf])
+    np.testing.assert_array_equal(tariff.step_prices, [100, 500])
+    with pytest.raises(KeyError):
+        load_tariff("missing", tariff_dir=tmp_path)
+
+
+def test_load_tariff_rejects_steps_with_upper_limit(tmp_path: Path) -> None:
+    table = {
+        "energy_price": [0.3] * 24,
+        "capacity_steps": [{"up_to_kw": 2, "monthly_price": 100}],
+    }
+    (tmp_path / "test.json").write_text(json.dumps(table))
+
+    with pytest.raises(ValueError):
+        load_tariff("test", tariff_dir=tmp_path)
+
+
+def test_shipped_tariffs_can_be_loaded() -> None:
+    assert "example" in available_tariffs()
+    for name in available_tariffs():
+        load_tariff(name)
+
+
+def test_get_grid_tariff() -> None:
+    result = Backend(path_to_norway_data=None).get_grid_tariff(
+        meter_names=["Trydal_1"],
+        start=datetime(2023, 1, 1, tzinfo=ZoneInfo("UTC")),
+        end=datetime(2023, 3, 31, 23, tzinfo=ZoneInfo("UTC")),
+    )
+
+    assert result.peak_kw.shape == (1, 3)
+    assert (result.capacity_step >= 0).all()
+    assert (result.total_cost > 0).all()
@@ -0,0 +1,138 @@
+import json
+import multiprocessing
+import os
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from backend.adapter.metrics_exporter.json_file_exporter import JsonFileExporter
+from backend.adapter.metrics_exporter.prometheus_exporter import (
+    PrometheusExporter,
+    format_prometheus,
+)
+from backend.instrumentation import Instrumentation, SamplingProfiler
+
+# inherited by forked worker processes, see test_forked_worker_exports_its_own_file
+_forked_instrumentation: Instrumentation | None = None
+
+
+def _stage_in_worker() -> int:
+    with _forked_instrumentation.stage("worker"):
+        pass
+    _forked_instrumentation.flush()
+    return os.getpid()
+
+
+class TestInstrumentation:
+    def test_nested_stages(self) -> None:
+        instrumentation = Instrumentation(trace_memory=True)
+
+        @instrumentation.instrumented("inner")
+        def inner() -> list[int]:
+            instrumentation.add_rows(10)
+            instrumentation.add_bytes(100)
+            return list(range(100_000))
+
+        with instrumentation.stage("outer") as stage:
+            inner()
+            inner()
+            stage.add_rows(1)
+
+        tracemalloc.stop()
+
+        stages = instrumentation.snapshot()["stages"]
+        assert stages["inner"]["calls"] == 2
+        assert stages["inner"]["rows"] == 20
+        assert stages["inner"]["bytes_read"] == 200
+        assert stages["outer"]["rows"] == 1
+        assert stages["outer"]["total_seconds"] >= stages["inner"]["total_seconds"]
+        assert stages["outer"]["peak_memory_bytes"] > 0
+
+    def test_exporters_are_called_in_the_background(self, tmp_path):
+        instrumentation = Instrumentation(
+            exporters=[
+                JsonFileExporter(tmp_path / "metrics.json"),
+                PrometheusExporter(tmp_path / "metrics.prom"),
+            ],
+            flush_interval=0.05,
+        )
+        instrumentation.register_source("flight", lambda: {"calls": 3})
+
+        with instrumentation.stage("outer"):
+            with instrumentation.stage("inner"):
+                pass
+        assert not (tmp_path / "metrics.json").exists()
+
+        deadline = time.perf_counter() + 5
+        while not (tmp_path / "metrics.prom").exists():
+            assert time.perf_counter() < deadline
+            time.sleep(0.01)
+        snapshot = json.loads((tmp_path / "metrics.json").read_text())
+        assert set(snapshot["stages"]) == {"outer", "inner"}
+        assert snapshot["sources"] == {"flight": {"calls": 3}}
+        assert (tmp_path / "metrics.prom").read_text() == format_prometheus(snapshot)
+
+    def test_format_prometheus(self) -> None:
+        instrumentation = Instrumentation()
+        with instrumentation.stage("get_price") as stage:
+            stage.add_rows(24)
+        instrumentation.record_cache("prices", hit=True)
+
+        text = format_prometheus(instrumentation.snapshot())
+
+        assert "# TYPE gnisten_stage_rows_total counter" in text
+        assert 'gnisten_stage_rows_total{stage="get_price"} 24' in text
+        assert 'gnisten_cache_hits_total{cache="prices"} 1' in text
+
+    def test_from_environment(self, monkeypatch, tmp_path) -> None:
+        monkeypatch.setenv("GNISTEN_METRICS", f"log,json:{tmp_path}/{{pid}}.json")
+        monkeypatch.setenv("GNISTEN_PROFILE", str(tmp_path / "profile.txt"))
+
+        instrumentation = Instrumentation.from_environment()
+
+        assert len(instrumentation.exporters) == 2
+        assert instrumentation.profiler is not None
+
+        monkeypatch.setenv("GNISTEN_METRICS", "statsd")
+        with pytest.raises(ValueError):
+            Instrumentation.from_environment()
+
+
+def test_sampling_profiler(tmp_path) -> None:
+    profiler = SamplingProfiler(tmp_path / "profile.txt", interval=0.001)
+    instrumentation = Instrumentation(profiler=profiler)
+
+    def busy_function() -> None:
+        end = time.perf_counter() + 0.1
+        while time.perf_counter() < end:
+            pass
+
+    with instrumentation.stage("busy"):
+        busy_function()
+    instrumentation.flush()
+
+    profile = (tmp_path / "profile.txt").read_text()
+    assert "busy_function" in profile
+
+
+def test_forked_worker_exports_its_own_file(tmp_path, monkeypatch) -> None:
+    instrumentation = Instrumentation(
+        exporters=[JsonFileExporter(tmp_path / "{pid}.json")], flush_interval=60
+    )
+    monkeypatch.setattr(
+        f"{__name__}._forked_instrumentation", instrumentation, raising=False
+    )
+    with instrumentation.stage("parent"):
+        pass
+
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("fork")
+    ) as executor:
+        worker_pid = executor.submit(_stage_in_worker).result()
+
+    assert worker_pid != os.getpid()
+    snapshot = json.loads((tmp_path / f"{worker_pid}.json").read_text())
+    assert set(snapshot["stages"]) == {"worker"}
+    assert not (tmp_path / f"{os.getpid()}.json").exists()
@@ -0,0 +1,111 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.app import Backend
+from backend.load_shifting import shift_load, simulate_load_shifting
+from backend.timeseries import to_day_matrix
+
+
+def test_shift_load_fills_cheapest_hours_up_to_capacity() -> None:
+    consumption = np.ones((1, 24))
+    price = np.arange(24, 0, -1, dtype=float)[None]  # cheapest in hour 23
+
+    shifted = shift_load(consumption, price, share=0.5, max_kwh_per_hour=4)
+
+    assert shifted.sum() == pytest.approx(24)
+    np.testing.assert_allclose(shifted[0, :20], 0.5)
+    np.testing.assert_allclose(shifted[0, 20:], [2, 4, 4, 4])
+
+
+def test_shift_load_only_to_allowed_hours() -> None:
+    consumption = np.full((2, 24), 2.0)
+    price = np.ones(24)
+    price[12] = 0.1
+
+    shifted = shift_load(
+        consumption, price, share=0.25, max_kwh_per_hour=5, allowed_hours=range(0, 6)
+    )
+
+    np.testing.assert_allclose(shifted.sum(axis=-1), 48)
+    assert shifted[0, 12] == pytest.approx(1.5)
+    np.testing.assert_allclose(shifted[:, 6:], 1.5)
+    np.testing.assert_allclose(shifted[:, :6].sum(axis=-1), 6 * 1.5 + 12)
+    assert shifted.max() == pytest.approx(5)
+
+
+def test_load_which_does_not_fit_stays() -> None:
+    consumption = np.ones((1, 24))
+
+    shifted = shift_load(
+        consumption, np.ones(24), share=1, max_kwh_per_hour=2, allowed_hours=[0]
+    )
+
+    # 2 kWh are moved to hour 0, the remaining 22 kWh stay in the other hours
+    assert shifted.max() <= 2
+    assert shifted[0, 0] == pytest.approx(2)
+    np.testing.assert_allclose(shifted[0, 1:], 22 / 23)
+
+
+def test_load_which_does_not_fit_is_not_added_to_filled_hours() -> None:
+    rng = np.random.default_rng(3)
+    consumption = rng.random((50, 24)) * 2
+
+    shifted = shift_load(
+        consumption,
+        rng.random((50, 24)),
+        share=np.array([0.3, 0.6, 1.0])[:, None, None],
+        max_kwh_per_hour=2.5,
+        allowed_hours=range(0, 6),
+    )
+
+    assert shifted[..., :6].max() <= 2.5 + 1e-9
+    np.testing.assert_allclose(
+        shifted.sum(axis=-1), np.broadcast_to(consumption.sum(axis=-1), (3, 50))
+    )
+
+
+def test_simulate_load_shifting_skips_incomplete_days() -> None:
+    axis = pd.date_range("2023-01-01 12:00", "2023-01-04 23:00", freq="h", tz="UTC")
+    values = np.ones((2, len(axis)))
+    values[1, 20] = np.nan  # a missing reading on January 2 for meter b only
+    consumption, days = to_day_matrix(values, axis)
+    price, _ = to_day_matrix(
+        np.tile(np.arange(24.0), len(axis) // 24 + 1)[: len(axis)], axis
+    )
+
+    result = simulate_load_shifting(["a", "b"], consumption, price, shares=[0, 0.5, 1])
+
+    assert consumption.shape == (2, 4, 24)
+    assert days[0] == pd.Timestamp("2023-01-01", tz="UTC")
+    np.testing.assert_array_equal(result.days, [3, 2])
+    np.testing.assert_allclose(result.consumption, [72, 48])
+    assert result.savings.shape == (2, 3)
+    np.testing.assert_allclose(result.savings[:, 0], 0, atol=1e-9)
+    assert (np.diff(result.savings, axis=1) > 0).all()
+
+
+def test_backend_simulation_matches_cost_comparison(path_to_norway_prices) -> None:
+    start = datetime(2023, 1, 1, tzinfo=ZoneInfo("UTC"))
+    end = datetime(2023, 1, 31, hour=23, tzinfo=ZoneInfo("UTC"))
+    app = Backend()
+
+    result = app.simulate_load_shifting(
+        [0.0, 0.2], meter_names=["Trydal_1", "christine"], start=start, end=end
+    )
+    in_batches = app.simulate_load_shifting(
+        [0.0, 0.2],
+        meter_names=["Trydal_1", "christine"],
+        start=start,
+        end=end,
+        batch_size=1,
+    )
+    totals = app.get_parametric_comparison("Trydal_1", start=start, end=end).totals(0.4)
+
+    assert result.spot_cost_before[0] == pytest.approx(totals["Spotpris"])
+    assert result.norgespris_cost(0.4)[0] == pytest.approx(totals["Norgespris"])
+    assert result.savings[0, 1] > 0
+    pd.testing.assert_frame_equal(in_batches.to_frame(), result.to_frame())
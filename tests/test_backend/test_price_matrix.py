@@ -0,0 +1,106 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.adapter.price_fetcher.local_spot_price_fetcher import LocalSpotPriceFetcher
+from backend.app import Backend
+from backend.ports.price_fetcher import PriceFetcher
+from backend.price_matrix import PRICE_AREAS, PriceMatrix, PriceMatrixStore
+from backend.timeseries import hourly_axis
+
+UTC = ZoneInfo("UTC")
+
+
+class CountingFetcher(PriceFetcher):
+    """Two hours of prices, NO2 is missing the second hour."""
+
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+
+    def get_price(self, price_area, start, end):
+        self.calls.append(price_area)
+        area = int(price_area[-1])
+        prices = [
+            (datetime(2023, 1, 1, hour, tzinfo=UTC), 10.0 * area + hour)
+            for hour in range(2)
+        ]
+        return prices[:1] if price_area == "NO2" else prices
+
+
+def test_store_reads_every_area_once() -> None:
+    fetcher = CountingFetcher()
+    store = PriceMatrixStore(fetcher)
+
+    matrix = store.get()
+    store.get(datetime(2023, 1, 1, 1, tzinfo=UTC), None)
+
+    assert fetcher.calls == PRICE_AREAS
+    assert matrix.prices.shape == (2, 5)
+    np.testing.assert_array_equal(matrix.area("NO3"), [30, 31])
+    assert matrix.has_price.sum(axis=0).tolist() == [2, 1, 2, 2, 2]
+
+    store.invalidate()
+    store.get()
+    assert len(fetcher.calls) == 10
+
+
+def test_window_and_reindex() -> None:
+    axis = hourly_axis(
+        datetime(2023, 1, 1, tzinfo=UTC), datetime(2023, 1, 1, 3, tzinfo=UTC)
+    )
+    matrix = PriceMatrix(
+        axis=axis, areas=["A", "B"], prices=np.arange(8.0).reshape(4, 2)
+    )
+
+    window = matrix.window(axis[1], axis[2])
+    assert list(window.axis) == list(axis[1:3])
+    assert np.shares_memory(window.prices, matrix.prices)
+
+    reindexed = matrix.reindex(pd.date_range(axis[2], periods=4, freq="h"))
+    np.testing.assert_array_equal(reindexed[:2], [[4, 5], [6, 7]])
+    assert np.isnan(reindexed[2:]).all()
+
+
+def test_statistics_per_area() -> None:
+    axis = hourly_axis(
+        datetime(2023, 1, 1, tzinfo=UTC), datetime(2023, 1, 2, 23, tzinfo=UTC)
+    )
+    prices = np.ones((48, 2))
+    prices[:24, 0] = np.arange(24)
+    prices[24:, 1] = np.nan
+    matrix = PriceMatrix(axis=axis, areas=["A", "B"], prices=prices)
+
+    statistics = matrix.statistics("day")
+
+    assert statistics.loc[axis[0], ("A", "mean")] == pytest.approx(11.5)
+    assert statistics.loc[axis[0], ("A", "max")] == 23
+    assert statistics.loc[axis[24], ("B", "hours")] == 0
+    assert np.isnan(statistics.loc[axis[24], ("B", "mean")])
+
+
+def test_compare_price_areas(path_to_norway_prices) -> None:
+    start = datetime(2023, 1, 1, tzinfo=UTC)
+    end = datetime(2023, 1, 31, hour=23, tzinfo=UTC)
+    backend = Backend()
+
+    comparison = backend.compare_price_areas("Trydal_1", start, end)
+
+    assert list(comparison.index) == PRICE_AREAS
+    for price_area in PRICE_AREAS:
+        expected = backend.get_spotpris_cost_per_hour(
+            start, end, meter_name="Trydal_1", price_area=price_area
+        ).sum()
+        assert comparison.loc[price_area, "Spotpris"] == pytest.approx(expected)
+
+
+def test_matrix_from_price_files(path_to_norway_prices) -> None:
+    store = PriceMatrixStore(LocalSpotPriceFetcher(path_to_norway_prices))
+
+    matrix = store.get()
+
+    assert matrix.prices.shape == (31 * 24, 5)
+    assert matrix.has_price.all()
+    np.testing.assert_array_equal(matrix.prices[:24, 2], 100 + np.arange(24))
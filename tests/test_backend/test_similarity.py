@@ -0,0 +1,88 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pytest
+
+from backend.app import Backend
+from backend.similarity import FEATURES, LoadShapeIndex, load_shape_features, nearest
+from backend.timeseries import hourly_axis
+
+
+@pytest.fixture
+def features() -> np.ndarray:
+    rng = np.random.default_rng(1)
+    vectors = rng.random((500, FEATURES))
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.mark.filterwarnings("error")
+def test_load_shape_is_independent_of_household_size() -> None:
+    axis = hourly_axis(
+        datetime(2023, 1, 1, tzinfo=ZoneInfo("UTC")),
+        datetime(2023, 12, 31, 23, tzinfo=ZoneInfo("UTC")),
+    )
+    shape = 1 + np.sin(np.arange(len(axis)) * 2 * np.pi / 24)
+    consumption = np.stack([shape, 3 * shape, np.full(len(axis), np.nan)])
+    consumption[1, :2000] = np.nan  # no readings in the winter
+
+    result = load_shape_features(consumption, axis)
+
+    assert result.shape == (3, FEATURES)
+    np.testing.assert_allclose(result[0], result[1])
+    assert np.linalg.norm(result[0]) == pytest.approx(1)
+    assert np.isnan(result[2]).all()
+
+
+def test_nearest_in_blocks_is_exact(features: np.ndarray) -> None:
+    queries = features[:7] + 0.01
+    expected = np.argsort(
+        ((queries[:, None] - features[None]) ** 2).sum(axis=-1), axis=1
+    )[:, :4]
+
+    indices, distances = nearest(queries, features, k=4, block_size=64)
+
+    np.testing.assert_array_equal(indices, expected)
+    assert (np.diff(distances, axis=1) >= 0).all()
+
+
+def test_approximate_query_searching_all_lists_is_exact(features) -> None:
+    index = LoadShapeIndex.build([str(i) for i in range(500)], features, n_lists=20)
+
+    exact = index.query(features[:10], k=5)
+    approximate = index.query(features[:10], k=5, n_probe=20)
+
+    np.testing.assert_array_equal(approximate[0], exact[0])
+    np.testing.assert_allclose(approximate[1], exact[1], atol=1e-6)
+    assert np.diff(index.list_offsets).sum() == 500
+
+
+def test_approximate_query_finds_itself(features) -> None:
+    index = LoadShapeIndex.build([str(i) for i in range(500)], features, n_lists=20)
+
+    indices, distances = index.query(features[:50], k=1, n_probe=1)
+
+    np.testing.assert_array_equal(indices[:, 0], np.arange(50))
+    np.testing.assert_allclose(distances, 0, atol=1e-6)
+
+
+def test_meters_without_load_shape_are_left_out(features) -> None:
+    features[1] = np.nan
+
+    index = LoadShapeIndex.build(["a", "b", "c"], features[:3])
+
+    assert index.meter_names == ["a", "c"]
+    assert index.similar("a", k=5) == [
+        ("c", pytest.approx(index.query(features[0])[1][0, 1]))
+    ]
+    with pytest.raises(ValueError):
+        index.query(features[0], n_probe=1)
+
+
+def test_similar_meters() -> None:
+    backend = Backend(path_to_norway_data=None)
+
+    similar = backend.similar_meters("Trydal_1", k=5)
+
+    assert {name for name, _ in similar} == {"Trydal_2", "christine"}
+    assert similar[0][1] <= similar[1][1]
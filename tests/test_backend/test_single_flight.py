@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.single_flight import AsyncSingleFlight, SingleFlight
+
+
+class TestSingleFlight:
+    def test_concurrent_callers_share_one_computation(self) -> None:
+        flight = SingleFlight()
+        calls = []
+
+        def compute(value: int) -> int:
+            calls.append(value)
+            time.sleep(0.05)
+            return value * 2
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(flight.do("key", compute, 21))
+            )
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == [42] * 8
+        assert calls == [21]
+        assert flight.stats.calls == 1
+        assert flight.stats.shared == 7
+        assert flight.stats.share_ratio == pytest.approx(7 / 8)
+
+    def test_sequential_calls_are_not_cached(self) -> None:
+        flight = SingleFlight()
+
+        assert flight.do("key", lambda: 1) == 1
+        assert flight.do("key", lambda: 2) == 2
+        assert flight.stats.calls == 2
+
+    def test_exception_is_raised_for_all_waiters(self) -> None:
+        flight = SingleFlight()
+        started = threading.Event()
+
+        def fail() -> None:
+            started.set()
+            time.sleep(0.05)
+            raise ValueError("boom")
+
+        errors = []
+
+        def call() -> None:
+            try:
+                flight.do("key", fail)
+            except ValueError as error:
+                errors.append(error)
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait()
+        follower = threading.Thread(target=call)
+        follower.start()
+        leader.join()
+        follower.join()
+
+        assert len(errors) == 2
+        assert flight.stats.errors == 1
+
+
+class TestAsyncSingleFlight:
+    def test_concurrent_callers_share_one_computation(self) -> None:
+        calls = []
+
+        async def compute() -> int:
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return len(calls)
+
+        async def main() -> list[int]:
+            flight = AsyncSingleFlight()
+            results = await asyncio.gather(
+                *(flight.do("key", compute) for _ in range(5))
+            )
+            assert flight.stats.as_dict()["shared"] == 4
+            return results
+
+        assert asyncio.run(main()) == [1] * 5
+        assert len(calls) == 1
@@ -0,0 +1,28 @@
+from frontend.benchmark import INTERACTIONS, find_regressions, run_benchmark
+
+
+def report(p50: float, max_rss_mb: float = 200) -> dict:
+    return {"interactions": {"rerun": {"p50": p50}}, "max_rss_mb": max_rss_mb}
+
+
+def test_find_regressions() -> None:
+    baseline = report(0.2)
+
+    assert find_regressions(report(0.25), baseline) == []
+    assert find_regressions(report(0.31), baseline) == [
+        "rerun: median 0.310 s, limit 0.300 s"
+    ]
+    # short interactions are allowed the absolute tolerance
+    assert find_regressions(report(0.04), report(0.01)) == []
+    assert len(find_regressions(report(0.2, max_rss_mb=400), baseline)) == 1
+
+
+def test_run_benchmark(path_to_norway_prices) -> None:
+    result = run_benchmark(repeat=2, cold_samples=0)
+
+    assert list(result["interactions"]) == list(INTERACTIONS)
+    for stats in result["interactions"].values():
+        assert stats["runs"] == 2
+        assert 0 < stats["p50"] <= stats["max"]
+    assert result["max_rss_mb"] > 0
+    assert find_regressions(result, result) == []
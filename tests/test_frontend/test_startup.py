@@ -0,0 +1,43 @@
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+APP = Path(__file__).parents[2] / "frontend" / "Norgespriskalkulator.py"
+
+# Measured at about 3 s (cold) and 0.2 s (warm) on a laptop
+COLD_START_BUDGET_SECONDS = 10
+WARM_RERUN_BUDGET_SECONDS = 1
+
+
+def test_heavy_modules_are_not_imported_with_the_app_modules() -> None:
+    code = (
+        "import sys\n"
+        "import backend.instrumentation, frontend.graphics.controls\n"
+        "import frontend.graphics.elements, frontend.graphics.make_plot\n"
+        "print(sorted({'pandas', 'backend.app', 'utils.NorgesPlotter'}"
+        " & set(sys.modules)))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+
+    assert result.stdout.strip() == "[]"
+
+
+def test_cold_start_and_warm_rerun_budget(path_to_norway_prices) -> None:
+    app = AppTest.from_file(str(APP), default_timeout=COLD_START_BUDGET_SECONDS)
+
+    started = time.perf_counter()
+    app.run()
+    cold_start = time.perf_counter() - started
+
+    started = time.perf_counter()
+    app.run()
+    warm_rerun = time.perf_counter() - started
+
+    assert not app.exception
+    assert cold_start < COLD_START_BUDGET_SECONDS
+    assert warm_rerun < WARM_RERUN_BUDGET_SECONDS
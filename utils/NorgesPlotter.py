@@ -3,7 +3,6 @@ from typing import Union
 import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-import plotly.graph_objs as go
 
 
 class NorgesPlotter:
@@ -4,7 +4,31 @@ from pathlib import Path
 
 import pandas as pd
 
+from backend.instrumentation import instrumentation
 
+
+def read_elhub_file(csv_file) -> pd.DataFrame:
+    """
+    Read a single CSV file exported from Elhub, e.g. a new export with only the
+    latest day(s).
+    """
+    # Read CSV file with correct encoding and separator
+    instrumentation.add_bytes(os.path.getsize(csv_file))
+    df = pd.read_csv(csv_file, sep=";", encoding="utf-8")
+
+    # Convert comma to dot in numeric values and convert to float
+    if "KWH 60 Forbruk" in df.columns:
+        df["KWH 60 Forbruk"] = df["KWH 60 Forbruk"].str.replace(",", ".").astype(float)
+
+    # Convert date columns to datetime
+    if "Fra" in df.columns and "Til" in df.columns:
+        df["Fra"] = pd.to_datetime(df["Fra"], format="%d.%m.%Y %H:%M")
+        df["Til"] = pd.to_datetime(df["Til"], format="%d.%m.%Y %H:%M")
+
+    return df
+
+
+@instrumentation.instrumented("read_elhub_data")
 def read_elhub_data(base_path=None, meter_dirs=None) -> dict[str, pd.DataFrame]:
     """
     Read all CSV files from specified meter directories and concatenate them.
@@ -54,21 +78,7 @@ def read_elhub_data(base_path=None, meter_dirs=None) -> dict[str, pd.DataFrame]:
 
         for csv_file in csv_files:
             try:
-                # Read CSV file with correct encoding and separator
-                df = pd.read_csv(csv_file, sep=";", encoding="utf-8")
-
-                # Convert comma to dot in numeric values and convert to float
-                if "KWH 60 Forbruk" in df.columns:
-                    df["KWH 60 Forbruk"] = (
-                        df["KWH 60 Forbruk"].str.replace(",", ".").astype(float)
-                    )
-
-                # Convert date columns to datetime
-                if "Fra" in df.columns and "Til" in df.columns:
-                    df["Fra"] = pd.to_datetime(df["Fra"], format="%d.%m.%Y %H:%M")
-                    df["Til"] = pd.to_datetime(df["Til"], format="%d.%m.%Y %H:%M")
-
-                dfs.append(df)
+                dfs.append(read_elhub_file(csv_file))
 
             except Exception as e:
                 print(f"Error reading {csv_file}: {e}")
@@ -84,6 +94,7 @@ def read_elhub_data(base_path=None, meter_dirs=None) -> dict[str, pd.DataFrame]:
             concatenated_df = concatenated_df.sort_values("Fra")
 
             meter_data[meter_dir] = concatenated_df
+            instrumentation.add_rows(len(concatenated_df))
             print(
                 f"Processed {len(dfs)} files for {meter_dir}, final DataFrame shape: {concatenated_df.shape}"
             )